@@ -4,97 +4,215 @@ from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from database.database import students_collection, teachers_collection, admins_collection
 from datetime import datetime, timedelta
-from bson import ObjectId, errors as bson_errors
+from bson import ObjectId
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import time
+
+# Độ khó bcrypt (log2 số vòng). Đổi giá trị thì mật khẩu cũ được băm lại khi người dùng đăng nhập
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Số luồng riêng cho bcrypt: giới hạn CPU dành cho đăng nhập, không chặn event loop
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Độ khó bcrypt cho mật khẩu ban đầu khi nhập danh sách lớp hàng loạt. Mặc định bằng BCRYPT_ROUNDS;
+# chỉ khi đặt thấp hơn (tùy chọn, để nhập nhanh) thì hash được nâng lên BCRYPT_ROUNDS ở lần đăng nhập đầu tiên
+IMPORT_BCRYPT_ROUNDS = int(os.getenv("IMPORT_BCRYPT_ROUNDS", str(BCRYPT_ROUNDS)))
+
+# min_rounds: hash có độ khó thấp hơn BCRYPT_ROUNDS bị đánh dấu cần băm lại ở lần đăng nhập kế tiếp
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS
+)
+_import_pwd_context = (
+    CryptContext(schemes=["bcrypt"], bcrypt__rounds=IMPORT_BCRYPT_ROUNDS)
+    if IMPORT_BCRYPT_ROUNDS < BCRYPT_ROUNDS else pwd_context
+)
+_password_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="") 
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY", "motkhacbimatchoadmin123")
 ALGORITHM = "HS256"
 
+# Cache người dùng đã xác thực: số bản ghi tối đa và thời gian sống (giây)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+# Bật thì lấy tên, lớp, môn... từ token, không đọc MongoDB mỗi request
+# (đổi thông tin hoặc xóa tài khoản chỉ có hiệu lực với token cấp sau đó)
+AUTH_CLAIMS_ONLY = os.getenv("AUTH_CLAIMS_ONLY", "false").lower() in ("1", "true", "yes")
+CLAIM_FIELDS = {
+    "student": ("name", "email", "classinfor"),
+    "teacher": ("name", "email", "subject"),
+    "admin": ("name", "email"),
+}
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def create_access_token(data: dict, expires_delta: timedelta = None):
+def hash_initial_password(password: str) -> str:
+    # Dùng khi nhập danh sách lớp; cùng độ khó với hash_password trừ khi đặt IMPORT_BCRYPT_ROUNDS thấp hơn
+    return _import_pwd_context.hash(password)
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    """
+    Kiểm tra mật khẩu trên luồng bcrypt riêng. Trả về (đúng/sai, hash mới nếu cần băm lại theo BCRYPT_ROUNDS hiện tại).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+async def verify_and_rehash(collection, user: dict, plain_password: str) -> bool:
+    """
+    Kiểm tra mật khẩu khi đăng nhập; nếu độ khó đã đổi thì lưu lại hash mới cho người dùng.
+    """
+    valid, new_hash = await verify_password_async(plain_password, user["password"])
+    if valid and new_hash:
+        await collection.update_one(
+            {"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}}
+        )
+    return valid
+
+def shutdown_password_executor():
+    _password_executor.shutdown(wait=False, cancel_futures=True)
+
+def create_access_token(data: dict, expires_delta: timedelta = None, secret_key: str = SECRET_KEY):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=120))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=120))
+    # iat dùng làm một phần khóa cache principal: token mới cấp luôn đọc lại thông tin người dùng
+    to_encode.update({"exp": expire, "iat": now})
+    encoded_jwt = jwt.encode(to_encode, secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_student(token: str = Depends(oauth2_scheme)):
+def principal_claims(user: dict) -> dict:
+    """
+    Thông tin người dùng nhúng vào token, chỉ ở chế độ AUTH_CLAIMS_ONLY:
+    mặc định token không mang tên, email, lớp/môn.
+    """
+    if not AUTH_CLAIMS_ONLY:
+        return {}
+    return {field: user.get(field) for field in CLAIM_FIELDS.get(user.get("role"), ()) if user.get(field) is not None}
+
+
+class PrincipalCache:
+    """
+    Cache LRU + TTL cho người dùng đã xác thực, khóa (role, id, iat của token).
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def set(self, key, principal: dict):
+        self._entries[key] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, role: str, user_id: str):
+        # Xóa mọi token (mọi iat) của người dùng này
+        for key in [key for key in self._entries if key[0] == role and key[1] == user_id]:
+            del self._entries[key]
+        self.stats["invalidations"] += 1
+
+    def get_stats(self):
+        return {**self.stats, "size": len(self._entries), "max_size": self.max_size, "ttl_seconds": self.ttl}
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+ROLE_COLLECTIONS = {
+    "student": students_collection,
+    "teacher": teachers_collection,
+    "admin": admins_collection,
+}
+
+
+def invalidate_principal(role: str, user_id: str):
+    """
+    Gọi sau khi cập nhật/xóa học sinh, giáo viên hoặc quản trị viên.
+    """
+    principal_cache.invalidate(role, str(user_id))
+
+
+async def _load_principal(role: str, user_id: str, iat):
+    key = (role, user_id, iat)
+    principal = principal_cache.get(key)
+    if principal is None:
+        principal = await ROLE_COLLECTIONS[role].find_one({"_id": ObjectId(user_id)}, {"password": 0})
+        if principal is None:
+            return None
+        principal["id"] = str(principal.pop("_id"))
+        principal_cache.set(key, principal)
+    # Trả về bản sao để route có sửa dict cũng không làm hỏng cache
+    return dict(principal)
+
+
+async def load_profile(principal: dict):
+    """
+    Hồ sơ đầy đủ của người dùng hiện tại (cho /me). Ở chế độ claims-only principal chỉ gồm các claim
+    trong token nên đọc lại từ MongoDB (qua cache); bình thường dùng luôn principal, không truy vấn lần nữa.
+    """
+    if not principal.get("claims_only"):
+        return principal
+    return await _load_principal(principal["role"], principal["id"], principal.get("iat"))
+
+
+async def _authenticate(token: str, role: str, secret_key: str, role_error: str, not_found_error: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("id")
-        role = payload.get("role")
-
-        if not user_id or role != "student":
-            raise HTTPException(status_code=401, detail="Token không hợp lệ hoặc không phải học sinh")
-
-        try:
-            obj_id = ObjectId(user_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="ID không hợp lệ")
-
-        student = students_collection.find_one({"_id": obj_id})
-        if not student:
-            raise HTTPException(status_code=404, detail="Không tìm thấy học sinh")
-
-        student["id"] = str(student.pop("_id"))
-        return student
-
+        payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=403, detail="Không thể xác thực token")
-    
-async def get_current_teacher(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("id")
-        role = payload.get("role")
-
-        if not user_id or role != "teacher":
-            raise HTTPException(status_code=401, detail="Token không hợp lệ hoặc không phải giáo viên")
 
-        try:
-            obj_id = ObjectId(user_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="ID không hợp lệ")
+    user_id = payload.get("id")
+    if not user_id or payload.get("role") != role:
+        raise HTTPException(status_code=401, detail=role_error)
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=400, detail="ID không hợp lệ")
 
-        teacher = teachers_collection.find_one({"_id": obj_id})
-        if not teacher:
-            raise HTTPException(status_code=404, detail="Không tìm thấy giáo viên")
+    if AUTH_CLAIMS_ONLY and "name" in payload:
+        # Không truy vấn MongoDB: dùng thông tin đã nhúng trong token
+        principal = {"id": user_id, "role": role, "iat": payload.get("iat"), "claims_only": True}
+        principal.update({field: payload[field] for field in CLAIM_FIELDS[role] if field in payload})
+        return principal
 
-        teacher["id"] = str(teacher.pop("_id"))
-        return teacher
+    principal = await _load_principal(role, user_id, payload.get("iat"))
+    if principal is None:
+        raise HTTPException(status_code=404, detail=not_found_error)
+    return principal
 
-    except JWTError:
-        raise HTTPException(status_code=403, detail="Không thể xác thực token")
+async def get_current_student(token: str = Depends(oauth2_scheme)):
+    return await _authenticate(
+        token, "student", SECRET_KEY,
+        "Token không hợp lệ hoặc không phải học sinh", "Không tìm thấy học sinh"
+    )
+    
+async def get_current_teacher(token: str = Depends(oauth2_scheme)):
+    return await _authenticate(
+        token, "teacher", SECRET_KEY,
+        "Token không hợp lệ hoặc không phải giáo viên", "Không tìm thấy giáo viên"
+    )
     
 async def get_current_admin(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, ADMIN_SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("id")
-        role = payload.get("role")
-
-        if not user_id or role != "admin":
-            raise HTTPException(status_code=401, detail="Token không hợp lệ hoặc không phải quản trị viên")
-
-        try:
-            obj_id = ObjectId(user_id)
-        except bson_errors.InvalidId:
-            raise HTTPException(status_code=400, detail="ID không hợp lệ")
-
-        admin = admins_collection.find_one({"_id": obj_id}) 
-        if not admin:
-            raise HTTPException(status_code=404, detail="Không tìm thấy quản trị viên")
-
-        admin["id"] = str(admin.pop("_id"))
-        return admin
-
-    except JWTError:
-        raise HTTPException(status_code=403, detail="Không thể xác thực token")
\ No newline at end of file
+    return await _authenticate(
+        token, "admin", ADMIN_SECRET_KEY,
+        "Token không hợp lệ hoặc không phải quản trị viên", "Không tìm thấy quản trị viên"
+    )
@@ -0,0 +1,236 @@
+"""
+Benchmark các API nóng ở nhiều quy mô dữ liệu: sinh dữ liệu giả, chạy từng kịch bản với số request và
+độ đồng thời cố định, in thông lượng và độ trễ p50/p99 dạng JSON.
+
+Ứng dụng chạy ngay trong tiến trình (httpx + ASGITransport, có lifespan: index, worker chấm điểm), với
+MongoDB cục bộ và nhà cung cấp LLM giả lập (stub). Database BENCH_DB_NAME bị xóa và sinh lại ở mỗi quy mô
+bằng database.seed.
+File tải lên được ghi vào một thư mục tạm, không đụng tới uploads/ thật.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.api_hot_paths --scales 1000 100000 --requests 200 --concurrency 20 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Phải đặt trước khi import ứng dụng: database.database và llm_providers đọc biến môi trường lúc import
+os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", "hethong_benchmark")
+os.environ.setdefault("GRADING_PROVIDER", "stub")
+os.environ.setdefault("STUB_LLM_LATENCY", "0.05")
+os.environ.setdefault("STUB_LLM_JITTER", "0.02")
+os.environ.setdefault("REQUEST_LOG_SAMPLE_RATE", "0")
+
+PROTECTED_DB_NAMES = {"hethong_database"}
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def make_pdf(index: int, pages: int = 1) -> bytes:
+    import fitz
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text(
+            (72, 72), f"Bai luan benchmark so {index}, trang {page_number + 1}.\n" + "Noi dung nghi luan. " * 40,
+            fontsize=11,
+        )
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+async def seed(essays: int, seed_value: int = 42, pdfs: int = 20):
+    """
+    Sinh dữ liệu bằng database.seed, số lớp / giáo viên / học sinh tăng theo số bài luận.
+    """
+    from database.database import identities_collection
+    from database.seed import seed_database, student_email, teacher_email
+
+    classes = max(4, essays // 500)
+    report = await seed_database(
+        classes=classes,
+        teachers=max(2, classes // 2),
+        students=max(10, min(classes * 30, essays // 5)),
+        essays=essays,
+        pdfs=pdfs,
+        seed=seed_value,
+        drop=True,
+    )
+    # Tài khoản đầu tiên của mỗi vai trò dùng cho các kịch bản cần đăng nhập
+    report["teacher"] = await identities_collection.find_one({"email": teacher_email(0)})
+    report["student"] = await identities_collection.find_one({"email": student_email(0)})
+    return report
+
+
+async def run_scenario(send, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+async def bench_scale(http, essays: int, args):
+    from database.seed import SEED_PASSWORD, student_email
+
+    seed_start = time.perf_counter()
+    seeded = await seed(essays, args.seed, args.pdfs)
+    seed_seconds = round(time.perf_counter() - seed_start, 2)
+
+    results = {}
+
+    async def login(email):
+        response = await http.post("/login", json={"email": email, "password": SEED_PASSWORD})
+        return response.json()["token"]
+
+    teacher_auth = {"Authorization": f"Bearer {await login(seeded['teacher']['email'])}"}
+    student_auth = {"Authorization": f"Bearer {await login(seeded['student']['email'])}"}
+    student_id = str(seeded["student"]["ref_id"])
+    teacher_id = str(seeded["teacher"]["ref_id"])
+
+    def get(path, headers=None):
+        return lambda i: http.get(path, headers=headers)
+
+    scenarios = {
+        "login": lambda i: http.post("/login", json={
+            "email": student_email(i % seeded["students"]), "password": SEED_PASSWORD
+        }),
+        "list_essays": get("/essays/?limit=50"),
+        "list_teacher_essays": get("/essays/teacher/essays?limit=50", teacher_auth),
+        "list_my_essays": get("/essays/my-essays?limit=50", student_auth),
+        "list_gradings": get("/gradings/?limit=50"),
+        "list_students": get("/students/?limit=50"),
+        "dashboard": get("/dashboard/"),
+        "dashboard_pie": get("/dashboard/stats/pie"),
+        "dashboard_all_month": get("/dashboard/stats/all?period=month"),
+        "teacher_dashboard_stats": get("/essays/teacher/dashboard/stats", teacher_auth),
+        "student_stats": get("/essays/my-stats", student_auth),
+    }
+    for name, send in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = await run_scenario(send, args.requests, args.concurrency)
+
+    # Nộp bài: mỗi request một file PDF khác nhau (không trùng hash nội dung)
+    pdfs = [make_pdf(i, pages=1 + i % 3) for i in range(args.uploads)]
+
+    def create_essay(i):
+        return http.post("/essays/", data={
+            "id_student": student_id, "id_teacher": teacher_id, "title": f"Bài nộp benchmark {i}",
+        }, files={"file": (f"bench_{i}.pdf", pdfs[i], "application/pdf")})
+
+    if not args.only or "create_essay" in args.only:
+        results["create_essay"] = await run_scenario(
+            create_essay, args.uploads, min(args.concurrency, args.uploads)
+        )
+
+    # Chấm lại theo lô các bài vừa nộp ở kịch bản create_essay, bỏ qua cache để luôn gọi LLM (stub)
+    def grade_batch(i):
+        files = [("files", (f"bench_{j}.pdf", pdfs[j], "application/pdf"))
+                 for j in range(i * args.grade_batch, (i + 1) * args.grade_batch)]
+        return http.post("/essays/grade?force=true", files=files)
+
+    batches = args.uploads // args.grade_batch
+    if batches and "create_essay" in results and (not args.only or "grade_batch" in args.only):
+        results["grade_batch"] = await run_scenario(grade_batch, batches, min(4, batches))
+        results["grade_batch"]["files_per_request"] = args.grade_batch
+
+    return {
+        "essays": essays,
+        "students": seeded["students"],
+        "teachers": seeded["teachers"],
+        "classes": seeded["classes"],
+        "gradings": seeded["gradings"],
+        "seed_seconds": seed_seconds,
+        "results": results,
+    }
+
+
+async def main(args):
+    if os.environ["DB_NAME"] in PROTECTED_DB_NAMES:
+        raise SystemExit(f"Không chạy benchmark trên database {os.environ['DB_NAME']}")
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    # Thư mục làm việc tạm: main.py mount uploads/ và blob_store ghi file theo đường dẫn tương đối
+    sys.path.insert(0, BACKEND_DIR)
+    workdir = tempfile.mkdtemp(prefix="hethong_bench_")
+    os.makedirs(os.path.join(workdir, "uploads"), exist_ok=True)
+    os.chdir(workdir)
+
+    import httpx
+    from main import app
+    from database.database import client, DB_NAME
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "database": DB_NAME,
+        "grading_provider": os.environ["GRADING_PROVIDER"],
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scales": [],
+    }
+    # Lifespan chạy một lần cho mọi quy mô (khi kết thúc sẽ đóng kết nối MongoDB và các pool)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+    ) as http:
+        try:
+            for essays in args.scales:
+                report["scales"].append(await bench_scale(http, essays, args))
+        finally:
+            if not args.keep:
+                await client.drop_database(DB_NAME)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000], help="Số bài luận ở mỗi quy mô")
+    parser.add_argument("--requests", type=int, default=200, help="Số request mỗi kịch bản đọc / đăng nhập")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--uploads", type=int, default=50, help="Số bài nộp trong kịch bản create_essay")
+    parser.add_argument("--grade-batch", type=int, default=5, help="Số file mỗi request POST /essays/grade")
+    parser.add_argument("--only", nargs="+", help="Chỉ chạy các kịch bản này")
+    parser.add_argument("--pdfs", type=int, default=20, help="Số file PDF mẫu trong kho của dữ liệu sinh ra")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Giữ lại database benchmark sau khi chạy")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+So sánh thông lượng khi nhiều request đồng thời truy vấn MongoDB trong cùng một event loop:
+pymongo.MongoClient đồng bộ (chặn loop, như trước đây) và AsyncMongoClient (database.database).
+
+Chạy từ thư mục backend, cần một mongod cục bộ:
+    python -m benchmarks.db_concurrency --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import time
+import pymongo
+from pymongo import AsyncMongoClient
+from database.database import MONGO_URI, DB_NAME
+
+BENCH_COLLECTION = "bench_db_concurrency"
+
+
+async def _measure_loop_lag(stop: asyncio.Event, samples: list):
+    # Đo độ trễ của event loop: một request "khác" chỉ cần loop rảnh là chạy được
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        samples.append(time.perf_counter() - start - 0.005)
+
+
+async def _run(handler, ids, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    lag_samples = []
+    lag_task = asyncio.create_task(_measure_loop_lag(stop, lag_samples))
+
+    async def one(i):
+        async with semaphore:
+            await handler(ids[i % len(ids)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    lag_samples.sort()
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "loop_lag_p99_ms": round(lag_samples[int(len(lag_samples) * 0.99) - 1] * 1000, 2) if lag_samples else None,
+    }
+
+
+async def main(args):
+    sync_collection = pymongo.MongoClient(MONGO_URI)[DB_NAME][BENCH_COLLECTION]
+    async_client = AsyncMongoClient(MONGO_URI)
+    async_collection = async_client[DB_NAME][BENCH_COLLECTION]
+
+    sync_collection.drop()
+    ids = sync_collection.insert_many(
+        [{"email": f"user{i}@bench.local", "classinfor": f"L{i % 40}"} for i in range(args.docs)]
+    ).inserted_ids
+
+    # Mỗi "request" giống một handler điển hình: đọc theo _id rồi đếm theo điều kiện
+    async def sync_handler(obj_id):
+        doc = sync_collection.find_one({"_id": obj_id})
+        sync_collection.count_documents({"classinfor": doc["classinfor"]})
+
+    async def async_handler(obj_id):
+        doc = await async_collection.find_one({"_id": obj_id})
+        await async_collection.count_documents({"classinfor": doc["classinfor"]})
+
+    try:
+        results = {
+            "concurrency": args.concurrency,
+            "sync_pymongo": await _run(sync_handler, ids, args.requests, args.concurrency),
+            "async_pymongo": await _run(async_handler, ids, args.requests, args.concurrency),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        sync_collection.drop()
+        await async_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--docs", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Mô phỏng nhiều học sinh đăng nhập cùng lúc (đầu giờ thi) và đo độ trễ của một request "khác"
+chạy song song trên cùng event loop:
+  - blocking: bcrypt chạy ngay trong handler async (như trước đây)
+  - executor: bcrypt chạy trên luồng riêng qua auth.verify_password_async
+
+Không cần MongoDB. Chạy từ thư mục backend:
+    python -m benchmarks.login_storm --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from auth import pwd_context, verify_password_async, BCRYPT_ROUNDS, BCRYPT_WORKERS
+
+PROBE_INTERVAL = 0.01  # Giây giữa hai request "khác"
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def _probe(stop: asyncio.Event, samples: list):
+    # Request nhẹ không liên quan đến đăng nhập: chỉ cần event loop rảnh là trả lời được
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def _blocking_login(password: str, hashed: str):
+    return pwd_context.verify(password, hashed)
+
+
+async def _executor_login(password: str, hashed: str):
+    valid, _ = await verify_password_async(password, hashed)
+    return valid
+
+
+async def _storm(login, hashed: str, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    samples = []
+    probe_task = asyncio.create_task(_probe(stop, samples))
+    # Đo độ trễ nền trước khi bắt đầu
+    await asyncio.sleep(PROBE_INTERVAL * 5)
+
+    async def one():
+        async with semaphore:
+            assert await login("matkhau123", hashed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return {
+        "logins": logins,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(logins / elapsed, 1),
+        "probe_ms_p50": round(statistics.median(samples), 2) if samples else None,
+        "probe_ms_p95": round(_percentile(samples, 95), 2) if samples else None,
+        "probe_ms_p99": round(_percentile(samples, 99), 2) if samples else None,
+        "probe_ms_max": round(max(samples), 2) if samples else None,
+        "probe_samples": len(samples),
+    }
+
+
+async def main(args):
+    hashed = pwd_context.hash("matkhau123")
+    results = {
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "bcrypt_workers": BCRYPT_WORKERS,
+        "blocking": await _storm(_blocking_login, hashed, args.logins, args.concurrency),
+        "executor": await _storm(_executor_login, hashed, args.logins, args.concurrency),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+"""
+Đo chi phí serialize mỗi document cho các API danh sách lớn (không cần MongoDB):
+cách cũ (convert_objectid đệ quy + jsonable_encoder + JSONResponse) so với MongoJSONResponse.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.serialization --sizes 100 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from responses import MongoJSONResponse, orjson
+
+
+def _legacy_convert_objectid(obj):
+    # Bản sao của convert_objectid trước đây trong CURD_essay.py / CURD_grading.py
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, dict):
+        return {k: _legacy_convert_objectid(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_legacy_convert_objectid(v) for v in obj]
+    return obj
+
+
+def make_essays(count: int, seed: int = 42):
+    # Document giống bài luận thật: ObjectId, datetime và kết quả chấm AI lồng nhau
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    essays = []
+    for i in range(count):
+        essays.append({
+            "_id": ObjectId(),
+            "id_student": ObjectId(),
+            "id_teacher": ObjectId(),
+            "title": f"Bài luận số {i}: Nghị luận về lòng biết ơn",
+            "file_url": f"/uploads/blobs/ab/{i:064x}.pdf",
+            "original_filename": f"bai_luan_{i}.pdf",
+            "submission_date": start + timedelta(minutes=rng.randint(0, 500000)),
+            "status": rng.choice(["pending", "approved", "rejected"]),
+            "grading_status": "done",
+            "content_hash": f"{i:064x}",
+            "file_size": rng.randint(20000, 2000000),
+            "page_count": rng.randint(1, 10),
+            "char_count": rng.randint(2000, 20000),
+            "ai_score": {
+                "phù_hợp": "Có",
+                "nội_dung": str(round(rng.uniform(0, 4), 1)),
+                "bố_cục": str(round(rng.uniform(0, 3), 1)),
+                "diễn_đạt": str(round(rng.uniform(0, 3), 1)),
+                "điểm_tổng": str(round(rng.uniform(0, 10), 1)),
+                "giải_thích_chung": "Bài viết có bố cục rõ ràng, lập luận chặt chẽ. " * 3,
+                "giải_thích_chi_tiết": "Mở bài giới thiệu vấn đề; thân bài phân tích; kết bài khẳng định. " * 5,
+            },
+        })
+    return essays
+
+
+def legacy_render(docs) -> bytes:
+    content = [_legacy_convert_objectid(doc) for doc in docs]
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def new_render(docs) -> bytes:
+    return MongoJSONResponse(docs).body
+
+
+def _best_of(fn, docs, repeat: int):
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn(docs))
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        docs = make_essays(size)
+        legacy_time, legacy_bytes = _best_of(legacy_render, docs, args.repeat)
+        new_time, new_bytes = _best_of(new_render, docs, args.repeat)
+        results.append({
+            "documents": size,
+            "legacy_us_per_doc": round(legacy_time / size * 1e6, 2),
+            "mongo_json_us_per_doc": round(new_time / size * 1e6, 2),
+            "speedup": round(legacy_time / new_time, 1),
+            "legacy_bytes": legacy_bytes,
+            "mongo_json_bytes": new_bytes,
+        })
+    print(json.dumps({"encoder": "orjson" if orjson else "json", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+from database.database import blobs_collection
+from upload_ingest import ingest_pdf_upload
+
+UPLOAD_DIR = "uploads"
+# File PDF được lưu theo hash nội dung: uploads/blobs/<2 ký tự đầu>/<sha256>.pdf
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+BLOB_TMP_DIR = os.path.join(BLOB_DIR, "tmp")
+
+
+def blob_relative_path(content_hash: str) -> str:
+    return f"{UPLOAD_DIR}/blobs/{content_hash[:2]}/{content_hash}.pdf"
+
+
+def blob_path(content_hash: str) -> str:
+    return os.path.join(BLOB_DIR, content_hash[:2], f"{content_hash}.pdf")
+
+
+def blob_url(content_hash: str) -> str:
+    return f"/{blob_relative_path(content_hash)}"
+
+
+async def put_blob(file: UploadFile):
+    """
+    Lưu file tải lên vào kho theo hash nội dung. Nếu nội dung đã có thì bỏ bản tạm, không ghi thêm bản nào.
+    Trả về dict gồm content_hash, size, path, file_url, deduplicated. Bên gọi nhận luôn một tham chiếu tới file:
+    phải gọi release() nếu cuối cùng không có bài luận nào dùng file này.
+    """
+    os.makedirs(BLOB_TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(BLOB_TMP_DIR, f"{uuid.uuid4().hex}.pdf")
+    upload = await ingest_pdf_upload(file, tmp_path)
+    content_hash = upload["content_hash"]
+    path = blob_path(content_hash)
+
+    # Giữ tham chiếu ngay khi ghi nhận blob để release/discard_if_unreferenced đồng thời không xóa mất file
+    result = await blobs_collection.update_one(
+        {"_id": content_hash},
+        {
+            "$setOnInsert": {
+                "path": blob_relative_path(content_hash),
+                "size": upload["size"],
+                "created_at": datetime.now()
+            },
+            "$inc": {"ref_count": 1},
+        },
+        upsert=True
+    )
+    try:
+        deduplicated = result.upserted_id is None and await asyncio.to_thread(os.path.exists, path)
+        if deduplicated:
+            await asyncio.to_thread(os.remove, tmp_path)
+        else:
+            await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+            await asyncio.to_thread(os.replace, tmp_path, path)
+    except BaseException:
+        await release(content_hash)
+        raise
+
+    return {
+        "content_hash": content_hash,
+        "size": upload["size"],
+        "path": path,
+        "file_url": blob_url(content_hash),
+        "deduplicated": deduplicated,
+    }
+
+
+async def release(content_hash: str):
+    """
+    Giảm số tham chiếu; khi không còn bài luận nào dùng thì xóa file khỏi kho.
+    """
+    if not content_hash:
+        return
+    blob = await blobs_collection.find_one_and_update(
+        {"_id": content_hash, "ref_count": {"$gt": 0}}, {"$inc": {"ref_count": -1}}, return_document=ReturnDocument.AFTER
+    )
+    if blob is None or blob["ref_count"] <= 0:
+        await discard_if_unreferenced(content_hash)
+
+
+async def discard_if_unreferenced(content_hash: str):
+    blob = await blobs_collection.find_one_and_delete({"_id": content_hash, "ref_count": {"$lte": 0}})
+    # Cùng nội dung vừa được tải lên lại (put_blob tạo lại bản ghi) thì giữ file
+    if blob is not None and await blobs_collection.find_one({"_id": content_hash}, {"_id": 1}) is None:
+        path = blob_path(content_hash)
+        if await asyncio.to_thread(os.path.exists, path):
+            await asyncio.to_thread(os.remove, path)
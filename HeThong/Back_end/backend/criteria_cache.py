@@ -0,0 +1,113 @@
+import asyncio
+import os
+import re
+import time
+from database.database import gradingCriterias_collection, counters_collection
+
+# Khoảng thời gian (giây) tối đa giữa hai lần kiểm tra phiên bản tiêu chí trên MongoDB,
+# để các worker/tiến trình khác nhận ra tiêu chí đã thay đổi
+CRITERIA_VERSION_CHECK_INTERVAL = float(os.getenv("CRITERIA_VERSION_CHECK_INTERVAL", "5"))
+CRITERIA_COUNTER_ID = "gradingCriterias_version"
+
+NO_CRITERIA_TEXT = "Không có tiêu chí chấm điểm cụ thể, chấm điểm theo cảm nhận tổng thể."
+
+
+class CriteriaSnapshot:
+    """
+    Ảnh chụp bất biến của toàn bộ tiêu chí chấm điểm tại một phiên bản, kèm phần prompt đã dựng sẵn.
+    """
+
+    def __init__(self, version: int, criteria_list: list):
+        self.version = version
+        self.criteria = criteria_list
+        self.by_id = {str(c["_id"]): c for c in criteria_list}
+        self._rendered = {}
+        # Dựng sẵn phần prompt cho trường hợp dùng tất cả tiêu chí (mặc định khi nộp bài)
+        self.render(None)
+
+    def select(self, selected_criteria_ids=None):
+        if not selected_criteria_ids:
+            return self.criteria
+        return [self.by_id[str(id)] for id in selected_criteria_ids if str(id) in self.by_id]
+
+    def render(self, selected_criteria_ids=None):
+        """
+        Trả về (đoạn mô tả tiêu chí, gợi ý đánh giá từng tiêu chí, mẫu JSON điểm từng tiêu chí).
+        """
+        key = frozenset(str(id) for id in selected_criteria_ids) if selected_criteria_ids else None
+        if key not in self._rendered:
+            self._rendered[key] = _render_criteria(self.select(selected_criteria_ids))
+        return self._rendered[key]
+
+
+def criteria_result_key(criteria_name: str) -> str:
+    # Khóa điểm của tiêu chí trong kết quả JSON của AI
+    return re.sub(r'\s+', '_', criteria_name).lower()
+
+
+def _render_criteria(criteria_list):
+    if not criteria_list:
+        return NO_CRITERIA_TEXT, "", ""
+
+    formatted_criteria = "\n".join(
+        f"- {criteria['name']}: {criteria.get('description', 'Không có mô tả')} (Tối đa {criteria['maxScore']} điểm)"
+        for criteria in criteria_list
+    )
+    criteria_placeholders = ""
+    criteria_results = ""
+    for criteria in criteria_list:
+        criteria_name_snake_case = criteria_result_key(criteria['name'])
+        criteria_placeholders += f'\n    - Mức độ {criteria["name"]} (nếu có trong tiêu chí).'
+        criteria_results += f'\n    "{criteria_name_snake_case}": "[Số điểm]",'
+
+    return f"Chấm theo các tiêu chí sau:\n{formatted_criteria}", criteria_placeholders, criteria_results
+
+
+_snapshot = None
+_last_checked = 0.0
+# Tăng mỗi lần bỏ ảnh chụp; lần đọc bắt đầu ở thế hệ cũ thì không được lưu kết quả
+_generation = 0
+_lock = asyncio.Lock()
+
+
+async def _read_version() -> int:
+    counter = await counters_collection.find_one({"_id": CRITERIA_COUNTER_ID})
+    return counter["value"] if counter else 0
+
+
+async def get_criteria_snapshot() -> CriteriaSnapshot:
+    """
+    Ảnh chụp tiêu chí hiện tại; chỉ đọc lại gradingCriterias khi phiên bản trên MongoDB thay đổi.
+    """
+    global _snapshot, _last_checked
+    if _snapshot is not None and time.monotonic() - _last_checked < CRITERIA_VERSION_CHECK_INTERVAL:
+        return _snapshot
+
+    async with _lock:
+        if _snapshot is not None and time.monotonic() - _last_checked < CRITERIA_VERSION_CHECK_INTERVAL:
+            return _snapshot
+
+        generation = _generation
+        snapshot = _snapshot
+        version = await _read_version()
+        if snapshot is None or snapshot.version != version:
+            criteria_list = await gradingCriterias_collection.find({}).to_list(None)
+            snapshot = CriteriaSnapshot(version, criteria_list)
+        # Cache bị bỏ trong lúc đang đọc: dùng kết quả cho lần gọi này nhưng không lưu lại
+        if generation == _generation:
+            _snapshot = snapshot
+            _last_checked = time.monotonic()
+        return snapshot
+
+
+async def invalidate_criteria_cache():
+    """
+    Gọi sau mỗi lần thêm/sửa/xóa tiêu chí: tăng phiên bản chung và bỏ ảnh chụp của tiến trình này.
+    """
+    global _snapshot, _generation
+    await counters_collection.update_one(
+        {"_id": CRITERIA_COUNTER_ID}, {"$inc": {"value": 1}}, upsert=True
+    )
+    async with _lock:
+        _generation += 1
+        _snapshot = None
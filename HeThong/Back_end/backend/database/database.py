@@ -1,8 +1,14 @@
-import pymongo
+import os
+from pymongo import AsyncMongoClient
+from metrics import MongoCommandMetrics
 
-# Kết nối đến MongoDB
-client = pymongo.MongoClient("mongodb://localhost:27017")
-db = client["hethong_database"] 
+# Kết nối đến MongoDB (PyMongo async API, không chặn event loop)
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "hethong_database")
+
+# Đếm số lệnh và thời gian của từng lệnh MongoDB (GET /metrics)
+client = AsyncMongoClient(MONGO_URI, event_listeners=[MongoCommandMetrics()])
+db = client[DB_NAME]
 
 # Collection cho sinh viên
 students_collection = db["students"]
@@ -15,4 +21,19 @@ essays_collection = db["essays"]
 # Collection cho bảng điểm
 gradings_collection = db["gradings"]
 # Collection cho quản trị viên
-admins_collection = db["admins"]
\ No newline at end of file
+admins_collection = db["admins"]
+# Collection kho file PDF theo hash nội dung (số tham chiếu từ essays)
+blobs_collection = db["blobs"]
+# Collection lưu văn bản đã trích xuất từ PDF (khóa theo hash nội dung file)
+essayTexts_collection = db["essayTexts"]
+# Collection bộ đếm dùng chung (phiên bản tiêu chí chấm điểm, ...)
+counters_collection = db["counters"]
+# Collection cache kết quả chấm AI (khóa theo hash nội dung)
+gradingCache_collection = db["gradingCache"]
+# Collection thống kê cộng dồn số bài luận theo ngày / phạm vi (toàn hệ thống, giáo viên, học sinh) / trạng thái
+essayStats_collection = db["essayStats"]
+# Collection định danh đăng nhập: email duy nhất trên mọi vai trò -> vai trò, id tài khoản, hash mật khẩu
+identities_collection = db["identities"]
+
+async def close_database():
+    await client.close()
@@ -0,0 +1,187 @@
+"""
+Khai báo index cho từng collection, tạo index lúc khởi động (idempotent) và kiểm tra query plan.
+
+    python -m database.indexes            # tạo index
+    python -m database.indexes --explain  # chạy explain() cho các truy vấn nóng, báo COLLSCAN
+"""
+import argparse
+import asyncio
+import json
+import logging
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from database.database import db
+
+# Index cùng tên/khóa đã tồn tại với tùy chọn khác (vd. expireAfterSeconds đã đổi)
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+from grading_cache import GRADING_CACHE_TTL
+
+INDEXES = {
+    "essays": [
+        IndexModel([("id_teacher", ASCENDING), ("submission_date", DESCENDING), ("_id", DESCENDING)],
+                   name="teacher_submission"),
+        IndexModel([("id_student", ASCENDING), ("submission_date", DESCENDING), ("_id", DESCENDING)],
+                   name="student_submission"),
+        IndexModel([("status", ASCENDING), ("submission_date", DESCENDING)], name="status_submission"),
+        IndexModel([("id_teacher", ASCENDING), ("status", ASCENDING)], name="teacher_status"),
+        IndexModel([("id_student", ASCENDING), ("status", ASCENDING)], name="student_status"),
+        # (submission_date, _id): thứ tự của phân trang keyset, xem database/pagination.py
+        IndexModel([("submission_date", DESCENDING), ("_id", DESCENDING)], name="submission_date"),
+        IndexModel([("grading_status", ASCENDING), ("submission_date", ASCENDING)], name="grading_status_submission"),
+        IndexModel([("file_url", ASCENDING)], name="file_url"),
+        IndexModel([("content_hash", ASCENDING)], name="content_hash"),
+        IndexModel([("original_filename", ASCENDING)], name="original_filename"),
+    ],
+    "gradings": [
+        IndexModel([("id_essay", ASCENDING)], name="essay"),
+        IndexModel([("id_teacher", ASCENDING), ("grading_date", DESCENDING), ("_id", DESCENDING)],
+                   name="teacher_grading_date"),
+        IndexModel([("grading_date", DESCENDING), ("_id", DESCENDING)], name="grading_date"),
+    ],
+    "students": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("classinfor", ASCENDING)], name="classinfor"),
+    ],
+    "teachers": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "admins": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "identities": [
+        # Email duy nhất trên mọi vai trò: đăng ký đồng thời cùng email chỉ một bản ghi được tạo
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("ref_id", ASCENDING)], name="role_ref_unique", unique=True),
+    ],
+    "gradingCriterias": [
+        # Không unique: chỉ phục vụ việc kiểm tra trùng tên khi thêm / sửa tiêu chí
+        IndexModel([("name", ASCENDING)], name="name"),
+    ],
+    "essayStats": [
+        IndexModel([("scope", ASCENDING), ("scope_id", ASCENDING), ("day", ASCENDING)], name="scope_day"),
+    ],
+    "gradingCache": [
+        IndexModel([("last_used_at", ASCENDING)], name="last_used_at"),
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=GRADING_CACHE_TTL),
+    ],
+}
+
+
+async def _create_index(collection, index: IndexModel):
+    try:
+        await collection.create_indexes([index])
+        return "ok"
+    except OperationFailure as e:
+        expire_after = index.document.get("expireAfterSeconds")
+        if expire_after is not None and e.code in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+            # TTL đã đổi so với lần trước: cập nhật index hiện có thay vì tạo lại
+            try:
+                await db.command({
+                    "collMod": collection.name,
+                    "index": {"name": index.document["name"], "expireAfterSeconds": expire_after},
+                })
+                return "updated"
+            except OperationFailure as collmod_error:
+                e = collmod_error
+        # Ví dụ: dữ liệu cũ bị trùng email nên không tạo được unique index
+        logging.error(f"❌ Không thể tạo index {collection.name}.{index.document['name']}: {e}")
+        return f"error: {e}"
+
+
+async def ensure_indexes():
+    """
+    Tạo tất cả index đã khai báo. Index đã tồn tại với cùng cấu hình thì MongoDB bỏ qua.
+    """
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for index in indexes:
+            report[f"{collection_name}.{index.document['name']}"] = await _create_index(collection, index)
+    logging.info("✅ Đã kiểm tra index cho các collection")
+    return report
+
+
+# Các dạng truy vấn nóng trong các router (giá trị mẫu chỉ để lấy query plan)
+_SAMPLE_ID = ObjectId()
+_SAMPLE_DATE = datetime(2025, 1, 1)
+HOT_QUERIES = [
+    ("essays by teacher", "essays", {"id_teacher": _SAMPLE_ID}, [("submission_date", -1)]),
+    ("essays by student", "essays", {"id_student": _SAMPLE_ID}, [("submission_date", -1)]),
+    ("essays by status", "essays", {"status": "pending"}, None),
+    ("essays graded", "essays", {"status": {"$in": ["approved", "rejected"]}}, None),
+    ("teacher essays by status", "essays", {"id_teacher": _SAMPLE_ID, "status": "pending"}, None),
+    ("student essays by status", "essays", {"id_student": _SAMPLE_ID, "status": "pending"}, None),
+    ("essays by submission range", "essays", {"submission_date": {"$gte": _SAMPLE_DATE}}, None),
+    ("class submissions", "essays",
+     {"id_student": {"$in": [str(_SAMPLE_ID)]}, "submission_date": {"$gte": _SAMPLE_DATE, "$lte": datetime(2025, 12, 31)}},
+     None),
+    ("essays by file_url", "essays", {"file_url": "/uploads/baitap.pdf"}, None),
+    ("essays by content_hash", "essays", {"content_hash": "0" * 64}, None),
+    ("grading queue recovery", "essays", {"$or": [
+        {"grading_status": "queued"},
+        {"grading_status": "running", "grading_lease_until": {"$not": {"$gte": datetime(2000, 1, 1)}}},
+    ]}, [("submission_date", 1)]),
+    ("gradings by essay", "gradings", {"id_essay": _SAMPLE_ID}, None),
+    ("gradings by teacher", "gradings", {"id_teacher": _SAMPLE_ID}, None),
+    ("login", "identities", {"email": "a@example.com"}, None),
+    ("students by class", "students", {"classinfor": "12A1"}, None),
+    ("admin login", "admins", {"email": "a@example.com"}, None),
+    ("teacher stats rollup", "essayStats", {"scope": "teacher", "scope_id": _SAMPLE_ID}, [("day", 1)]),
+    ("criteria by name", "gradingCriterias", {"name": "Nội dung"}, None),
+]
+
+
+def _plan_stages(plan):
+    # Duyệt cây query plan (cả dạng classic lẫn SBE) để lấy tên các stage
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def explain_hot_queries():
+    """
+    Chạy explain() cho từng truy vấn nóng; đánh dấu những truy vấn phải quét toàn bộ collection.
+    """
+    results = []
+    for name, collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan)
+        results.append({
+            "query": name,
+            "collection": collection_name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return {
+        "collscan_count": sum(1 for r in results if r["collscan"]),
+        "queries": results,
+    }
+
+
+async def _main(args):
+    print(json.dumps(await ensure_indexes(), indent=2, ensure_ascii=False))
+    if args.explain:
+        report = await explain_hot_queries()
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if report["collscan_count"]:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--explain", action="store_true", help="Kiểm tra query plan của các truy vấn nóng")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import os
+from typing import Optional
+from bson import json_util
+from fastapi import HTTPException, Query, Response
+
+# Số bản ghi mặc định và tối đa mỗi trang của các API danh sách
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "500"))
+# Header trả về cursor của trang tiếp theo (không có header nghĩa là đã hết dữ liệu)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Không bao giờ trả về các trường này trong API danh sách
+ALWAYS_HIDDEN_FIELDS = ("password",)
+
+
+class PageParams:
+    """
+    Tham số phân trang dùng chung: Depends(PageParams) trong các API danh sách.
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Số bản ghi mỗi trang"),
+        cursor: Optional[str] = Query(None, description=f"Giá trị header {NEXT_CURSOR_HEADER} của trang trước"),
+        sort: str = Query("_id", description="Trường sắp xếp"),
+        order: str = Query("desc", enum=["asc", "desc"]),
+        fields: Optional[str] = Query(None, description="Danh sách trường cần lấy, cách nhau bởi dấu phẩy"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+        self.order = order
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+
+def encode_cursor(sort_value, last_id) -> str:
+    raw = json_util.dumps({"v": sort_value, "id": last_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json_util.loads(raw.decode("utf-8"))
+        return data["v"], data["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor phân trang không hợp lệ")
+
+
+def _projection(page: PageParams, hidden_fields):
+    if page.fields:
+        projection = {field: 1 for field in page.fields if field not in hidden_fields and not field.startswith("$")}
+        # Luôn cần trường sắp xếp để tạo cursor cho trang sau
+        projection[page.sort] = 1
+        return projection
+    return {field: 0 for field in hidden_fields}
+
+
+async def paginate(collection, query: dict, page: PageParams, response: Response,
+                   sort_fields=("_id",), hidden_fields=ALWAYS_HIDDEN_FIELDS):
+    """
+    Phân trang keyset theo (page.sort, _id): mỗi trang là một truy vấn dùng index, không dùng skip.
+    Trả về danh sách document của trang hiện tại, cursor trang sau đặt ở header X-Next-Cursor.
+    """
+    if page.sort not in sort_fields:
+        raise HTTPException(
+            status_code=400, detail=f"Chỉ được sắp xếp theo: {', '.join(sort_fields)}"
+        )
+    direction = -1 if page.order == "desc" else 1
+    op = "$lt" if direction == -1 else "$gt"
+
+    if page.cursor:
+        sort_value, last_id = decode_cursor(page.cursor)
+        if page.sort == "_id":
+            keyset = {"_id": {op: last_id}}
+        else:
+            keyset = {"$or": [
+                {page.sort: {op: sort_value}},
+                {page.sort: sort_value, "_id": {op: last_id}},
+            ]}
+        query = {"$and": [query, keyset]} if query else keyset
+
+    sort = [(page.sort, direction)] if page.sort == "_id" else [(page.sort, direction), ("_id", direction)]
+    docs = await collection.find(query, _projection(page, hidden_fields)).sort(sort).limit(page.limit + 1).to_list(None)
+
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        last = docs[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.get(page.sort), last["_id"])
+    return docs
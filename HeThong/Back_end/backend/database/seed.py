@@ -0,0 +1,348 @@
+"""
+Sinh dữ liệu giả quy mô trường học để kiểm thử tải và khả năng mở rộng, xác định hoàn toàn theo --seed
+(cùng tham số và cùng --end-date thì cùng dữ liệu, cùng _id):
+lớp (classinfor), giáo viên theo môn, học sinh, bài luận nộp dồn về hạn nộp hằng tuần, bản chấm với ai_score
+theo đúng dạng kết quả của Gemini, và các file PDF mẫu nhiều số trang trong kho uploads/blobs (kèm ref_count).
+Sau khi ghi sẽ tạo index, định danh đăng nhập và tính lại bảng thống kê essayStats.
+
+Chạy từ thư mục backend:
+    python -m database.seed --classes 1000 --teachers 300 --students 40000 --essays 1000000 --pdfs 200 --drop
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+import fitz
+from bson import ObjectId
+from pymongo import InsertOne
+from auth import hash_password
+from blob_store import blob_path, blob_relative_path, blob_url
+from criteria_cache import criteria_result_key, invalidate_criteria_cache
+from database.database import (
+    client, DB_NAME, students_collection, teachers_collection, essays_collection, gradings_collection,
+    gradingCriterias_collection, blobs_collection, essayTexts_collection, identities_collection,
+)
+from database.indexes import ensure_indexes
+from identity_store import identity_document
+from pdf_extractor import extract_text_from_pdf
+from src.dashboard.rollup import rebuild_rollups
+
+SEED_PASSWORD = os.getenv("SEED_PASSWORD", "matkhau123")
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "5000"))
+EMAIL_DOMAIN = "truong.edu.vn"
+
+SUBJECTS = ["Ngữ văn", "Lịch sử", "Địa lý", "GDCD", "Tiếng Anh", "Sinh học", "Triết học"]
+GRADES = [10, 11, 12]
+FAMILY_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ", "Ngô"]
+MIDDLE_NAMES = ["Văn", "Thị", "Minh", "Ngọc", "Thanh", "Quốc", "Gia", "Hữu", "Thu", "Đức", "Bảo", "Khánh"]
+GIVEN_NAMES = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hạnh", "Hùng", "Hương", "Khoa", "Lan",
+               "Linh", "Long", "Mai", "Nam", "Ngân", "Phúc", "Quân", "Quỳnh", "Sơn", "Tâm", "Thảo", "Trang",
+               "Trung", "Tú", "Uyên", "Việt", "Vy", "Yến"]
+TOPICS = [
+    "Nghị luận về lòng biết ơn", "Suy nghĩ về tinh thần tự học", "Phân tích bài thơ Tây Tiến",
+    "Vai trò của thanh niên trong thời đại số", "Bảo vệ môi trường bắt đầu từ những việc nhỏ",
+    "Ý nghĩa của Cách mạng tháng Tám", "Biến đổi khí hậu ở Đồng bằng sông Cửu Long",
+    "Trách nhiệm của công dân với cộng đồng", "Ảnh hưởng của mạng xã hội đến học sinh",
+]
+CRITERIA = [
+    {"name": "Nội dung", "maxScore": 4, "description": "Đúng trọng tâm đề bài, lập luận chặt chẽ"},
+    {"name": "Bố cục", "maxScore": 2, "description": "Mở bài, thân bài, kết bài rõ ràng"},
+    {"name": "Diễn đạt", "maxScore": 2, "description": "Câu văn mạch lạc, dùng từ chính xác"},
+    {"name": "Sáng tạo", "maxScore": 1, "description": "Có góc nhìn hoặc dẫn chứng riêng"},
+    {"name": "Chính tả", "maxScore": 1, "description": "Không mắc lỗi chính tả, ngữ pháp"},
+]
+FEEDBACKS = [
+    "Bài viết tốt, cần thêm dẫn chứng thực tế.", "Bố cục rõ ràng nhưng lập luận chưa sâu.",
+    "Cần chú ý lỗi chính tả.", "Ý tưởng hay, diễn đạt còn lủng củng.", "Bài làm lạc đề một phần.",
+]
+# Font chuẩn của PDF không có đủ dấu tiếng Việt: nội dung file mẫu viết không dấu
+PDF_SENTENCES = [
+    "Trong cuoc song, long biet on la gia tri nen tang giup con nguoi gan ket voi nhau.",
+    "Moi hoc sinh can tu giac ren luyen tinh than tu hoc de thich ung voi the gioi thay doi tung ngay.",
+    "Tac pham da khac hoa ro net ve dep hao hung va lang man cua nguoi linh Tay Tien.",
+    "Thanh nien can chu dong tiep can cong nghe nhung khong danh mat ban sac van hoa dan toc.",
+    "Nhung viec nho nhu phan loai rac, tiet kiem nuoc co the tao nen thay doi lon cho moi truong.",
+    "Dan chung cu the va lap luan chat che giup bai viet thuyet phuc nguoi doc hon.",
+]
+# Thời gian (ms) điển hình của từng bước chấm AI, dùng cho trường timings của bản chấm (xem grading_timing.py)
+STAGE_MEDIANS_MS = {"criteria": 1.5, "cache": 2.0, "prompt": 0.3, "llm": 6500.0, "parse": 0.8, "db_write": 4.0}
+
+
+def student_email(index: int) -> str:
+    return f"hs{index:06d}@{EMAIL_DOMAIN}"
+
+
+def teacher_email(index: int) -> str:
+    return f"gv{index:05d}@{EMAIL_DOMAIN}"
+
+
+def _object_id(rng: random.Random, when: datetime) -> ObjectId:
+    # 4 byte thời gian như ObjectId thật (thứ tự _id khớp thời điểm tạo) + 8 byte ngẫu nhiên theo seed
+    timestamp = int(when.timestamp()) & 0xFFFFFFFF
+    return ObjectId(timestamp.to_bytes(4, "big") + rng.getrandbits(64).to_bytes(8, "big"))
+
+
+def _person_name(rng: random.Random) -> str:
+    return f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}"
+
+
+def _class_names(count: int):
+    # 10A1, 10A2, ..., 11A1, ...: chia đều cho các khối
+    per_grade = -(-count // len(GRADES))
+    return [f"{GRADES[i // per_grade]}A{i % per_grade + 1}" for i in range(count)]
+
+
+def _submission_date(rng: random.Random, start: datetime, end: datetime) -> datetime:
+    """
+    Phần lớn bài nộp dồn về hạn nộp cuối tuần (Chủ nhật 23:59), số còn lại rải đều trong khoảng thời gian.
+    """
+    span = (end - start).total_seconds()
+    if rng.random() < 0.15:
+        return start + timedelta(seconds=rng.uniform(0, span))
+    first_sunday = start + timedelta(days=(6 - start.weekday()) % 7)
+    weeks = max(1, int((end - first_sunday).total_seconds() // (7 * 86400)) + 1)
+    deadline = first_sunday + timedelta(days=7 * rng.randrange(weeks), hours=23, minutes=59)
+    # Khoảng cách tới hạn nộp theo phân phối mũ, trung bình 30 giờ
+    submitted = deadline - timedelta(hours=rng.expovariate(1 / 30))
+    return min(max(submitted, start), end)
+
+
+def _ai_score(rng: random.Random, relevant: bool = True):
+    scores = {}
+    for criteria in CRITERIA:
+        ratio = min(1.0, max(0.0, rng.gauss(0.68, 0.18))) if relevant else rng.uniform(0, 0.3)
+        scores[criteria_result_key(criteria["name"])] = round(criteria["maxScore"] * ratio * 4) / 4
+    total = sum(scores.values())
+    details = "; ".join(
+        f"{criteria['name']}: {scores[criteria_result_key(criteria['name'])]:g}/{criteria['maxScore']:g}"
+        for criteria in CRITERIA
+    )
+    return {
+        "phù_hợp": "Có" if relevant else "Không",
+        "giải_thích_chung": "Bài viết đáp ứng yêu cầu đề bài, lập luận tương đối chặt chẽ." if relevant
+        else "Bài viết không bám sát đề bài.",
+        "giải_thích_chi_tiết": details,
+        "điểm_tổng": f"{total:g}",
+        **{key: f"{value:g}" for key, value in scores.items()},
+    }, total
+
+
+def _timings(rng: random.Random, text_length: int):
+    stages = {name: round(median * rng.lognormvariate(0, 0.35), 2) for name, median in STAGE_MEDIANS_MS.items()}
+    prompt_tokens = 600 + text_length // 4
+    return {
+        "stages_ms": stages,
+        "total_ms": round(sum(stages.values()), 2),
+        "text_length": text_length,
+        "model": "gemini:gemini-2.0-flash",
+        "cached": False,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": rng.randint(250, 700),
+    }
+
+
+def make_sample_pdf(rng: random.Random, index: int, pages: int) -> bytes:
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        lines = [f"Bai luan mau so {index} - trang {page_number + 1}/{pages}", ""]
+        lines += [rng.choice(PDF_SENTENCES) for _ in range(rng.randint(18, 30))]
+        page.insert_textbox(fitz.Rect(56, 56, 540, 790), "\n".join(lines), fontsize=11)
+    # no_new_id: không sinh /ID ngẫu nhiên, cùng seed thì cùng nội dung file (cùng hash)
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return data
+
+
+async def _write_blobs(rng: random.Random, count: int, created_at: datetime):
+    """
+    Sinh count file PDF (1 đến 8 trang) vào kho uploads/blobs theo hash nội dung và lưu sẵn văn bản trích xuất.
+    Trả về danh sách thông tin file để gán cho bài luận; ref_count ghi sau khi biết số bài dùng mỗi file.
+    """
+    blobs = []
+    for index in range(count):
+        data = make_sample_pdf(rng, index, rng.randint(1, 8))
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = blob_path(content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        text, page_count = await asyncio.to_thread(extract_text_from_pdf, path)
+        blobs.append({"content_hash": content_hash, "size": len(data), "page_count": page_count, "text": text})
+
+    if blobs:
+        await essayTexts_collection.insert_many([{
+            "_id": blob["content_hash"], "text": blob["text"], "page_count": blob["page_count"],
+            "char_count": len(blob["text"]), "extracted_at": created_at,
+        } for blob in blobs])
+    return blobs
+
+
+async def _flush(collection, batch: list):
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        batch.clear()
+
+
+async def seed_database(classes: int, teachers: int, students: int, essays: int, pdfs: int = 50,
+                        seed: int = 42, days: int = 365, end_date: datetime = None, drop: bool = False):
+    """
+    Ghi dữ liệu giả vào database hiện tại (DB_NAME). Từ chối ghi vào database đã có dữ liệu trừ khi drop=True.
+    Trả về số bản ghi đã tạo của từng collection và thời gian chạy.
+    """
+    started = time.perf_counter()
+    if drop:
+        await client.drop_database(DB_NAME)
+    elif await essays_collection.estimated_document_count() or await students_collection.estimated_document_count():
+        raise SystemExit(f"Database {DB_NAME} đã có dữ liệu, dùng --drop để xóa trước khi sinh")
+
+    rng = random.Random(seed)
+    end = end_date or datetime.combine(datetime.now().date(), datetime.min.time())
+    start = end - timedelta(days=days)
+    # Mọi tài khoản dùng chung một mật khẩu: chỉ băm một lần
+    password = hash_password(SEED_PASSWORD)
+
+    class_names = _class_names(max(1, classes))
+    teacher_docs = []
+    for i in range(max(1, teachers)):
+        teacher_docs.append({
+            "_id": _object_id(rng, start), "name": _person_name(rng), "email": teacher_email(i), "password": password,
+            "subject": SUBJECTS[i % len(SUBJECTS)], "graded_essays": [], "role": "teacher",
+        })
+    # Mỗi lớp có 1-3 giáo viên bộ môn
+    class_teachers = {name: rng.sample(teacher_docs, min(len(teacher_docs), rng.randint(1, 3))) for name in class_names}
+
+    student_docs = []
+    for i in range(max(1, students)):
+        student_docs.append({
+            "_id": _object_id(rng, start), "name": _person_name(rng), "email": student_email(i), "password": password,
+            "classinfor": class_names[i % len(class_names)], "essays": [], "created_at": start, "role": "student",
+        })
+
+    for collection, docs in ((teachers_collection, teacher_docs), (students_collection, student_docs)):
+        for offset in range(0, len(docs), SEED_BATCH_SIZE):
+            await collection.insert_many(docs[offset:offset + SEED_BATCH_SIZE], ordered=False)
+    identities = [identity_document("teacher", t) for t in teacher_docs] + \
+                 [identity_document("student", s) for s in student_docs]
+    for offset in range(0, len(identities), SEED_BATCH_SIZE):
+        await identities_collection.insert_many(identities[offset:offset + SEED_BATCH_SIZE], ordered=False)
+
+    await gradingCriterias_collection.insert_many([{**c, "_id": _object_id(rng, start)} for c in CRITERIA])
+    await invalidate_criteria_cache()
+
+    blobs = await _write_blobs(rng, max(1, pdfs), start)
+    ref_counts = {}
+
+    # Mức độ chăm nộp bài khác nhau giữa các học sinh (phân phối Pareto)
+    cum_weights = []
+    total_weight = 0.0
+    for _ in student_docs:
+        total_weight += rng.paretovariate(1.5)
+        cum_weights.append(total_weight)
+
+    essay_batch, grading_batch = [], []
+    grading_count = 0
+    recent = end - timedelta(days=7)
+    for i in range(essays):
+        student = rng.choices(student_docs, cum_weights=cum_weights)[0]
+        teacher = rng.choice(class_teachers[student["classinfor"]])
+        submitted = _submission_date(rng, start, end)
+        if submitted >= recent:
+            status = rng.choices(["pending", "approved", "rejected"], weights=[60, 32, 8])[0]
+        else:
+            status = rng.choices(["pending", "approved", "rejected"], weights=[4, 80, 16])[0]
+        blob = blobs[int(rng.paretovariate(1.2) - 1) % len(blobs)]
+        ref_counts[blob["content_hash"]] = ref_counts.get(blob["content_hash"], 0) + 1
+        ai_score, ai_total = _ai_score(rng, relevant=rng.random() > 0.05)
+
+        essay = {
+            "_id": _object_id(rng, submitted),
+            "id_student": student["_id"],
+            "id_teacher": teacher["_id"],
+            "title": rng.choice(TOPICS),
+            "file_url": blob_url(blob["content_hash"]),
+            "original_filename": f"bai_luan_{i:07d}.pdf",
+            "submission_date": submitted,
+            "status": status,
+            # Đã chấm AI xong: không bị xếp lại vào hàng đợi chấm khi server khởi động
+            "grading_status": "done",
+            "content_hash": blob["content_hash"],
+            "file_size": blob["size"],
+            "page_count": blob["page_count"],
+            "char_count": len(blob["text"]),
+            "ai_score": ai_score,
+        }
+        essay_batch.append(InsertOne(essay))
+        if status != "pending":
+            graded_at = submitted + timedelta(hours=rng.expovariate(1 / 36))
+            grading_batch.append(InsertOne({
+                "_id": _object_id(rng, graded_at),
+                "id_essay": essay["_id"],
+                "id_teacher": teacher["_id"],
+                "final_score": round(min(10.0, max(0.0, ai_total + rng.gauss(0, 0.75))) * 4) / 4,
+                "feedback": rng.choice(FEEDBACKS),
+                "ai_score": ai_score,
+                "grading_date": graded_at,
+                "timings": _timings(rng, len(blob["text"])),
+            }))
+            grading_count += 1
+        if len(essay_batch) >= SEED_BATCH_SIZE:
+            await _flush(essays_collection, essay_batch)
+        if len(grading_batch) >= SEED_BATCH_SIZE:
+            await _flush(gradings_collection, grading_batch)
+    await _flush(essays_collection, essay_batch)
+    await _flush(gradings_collection, grading_batch)
+
+    await blobs_collection.insert_many([{
+        "_id": blob["content_hash"], "path": blob_relative_path(blob["content_hash"]), "size": blob["size"],
+        "ref_count": ref_counts.get(blob["content_hash"], 0), "created_at": start,
+    } for blob in blobs])
+
+    await ensure_indexes()
+    stats_documents = await rebuild_rollups()
+    # Đổi tên collection khi tính lại thống kê làm mất index của essayStats, tạo lại
+    await ensure_indexes()
+
+    return {
+        "database": DB_NAME,
+        "seed": seed,
+        "start": start,
+        "end": end,
+        "classes": len(class_names),
+        "teachers": len(teacher_docs),
+        "students": len(student_docs),
+        "identities": len(identities),
+        "essays": essays,
+        "gradings": grading_count,
+        "blobs": len(blobs),
+        "essay_stats": stats_documents,
+        "password": SEED_PASSWORD,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+async def _main(args):
+    report = await seed_database(
+        classes=args.classes, teachers=args.teachers, students=args.students, essays=args.essays, pdfs=args.pdfs,
+        seed=args.seed, days=args.days, drop=args.drop,
+        end_date=datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else None,
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--teachers", type=int, default=30)
+    parser.add_argument("--students", type=int, default=1200)
+    parser.add_argument("--essays", type=int, default=20000)
+    parser.add_argument("--pdfs", type=int, default=50, help="Số file PDF mẫu khác nhau trong kho")
+    parser.add_argument("--days", type=int, default=365, help="Số ngày trải dữ liệu nộp bài")
+    parser.add_argument("--end-date", help="Ngày cuối của dữ liệu (YYYY-MM-DD), mặc định hôm nay")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Xóa toàn bộ database DB_NAME trước khi sinh")
+    asyncio.run(_main(parser.parse_args()))
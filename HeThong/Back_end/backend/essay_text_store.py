@@ -0,0 +1,51 @@
+import asyncio
+import hashlib
+from datetime import datetime
+from database.database import essayTexts_collection
+from pdf_extractor import extract_text
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _sha256_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def file_sha256(file_path: str) -> str:
+    return await asyncio.to_thread(_sha256_file, file_path)
+
+
+async def get_stored_text(content_hash: str):
+    """
+    Văn bản đã trích xuất của file có hash tương ứng, None nếu chưa có.
+    """
+    return await essayTexts_collection.find_one({"_id": content_hash})
+
+
+async def get_essay_text(file_path: str, content_hash: str = None):
+    """
+    Lấy văn bản của bài luận theo hash nội dung file; chỉ trích xuất lại PDF khi hash chưa có trong kho.
+    Trả về dict gồm content_hash, text, page_count, char_count.
+    """
+    if content_hash is None:
+        content_hash = await file_sha256(file_path)
+
+    stored = await get_stored_text(content_hash)
+    if stored is not None:
+        stored["content_hash"] = stored.pop("_id")
+        return stored
+
+    text, page_count = await extract_text(file_path)
+    record = {
+        "text": text,
+        "page_count": page_count,
+        "char_count": len(text),
+        "extracted_at": datetime.now()
+    }
+    await essayTexts_collection.update_one({"_id": content_hash}, {"$set": record}, upsert=True)
+    record["content_hash"] = content_hash
+    return record
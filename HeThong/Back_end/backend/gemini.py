@@ -1,62 +1,101 @@
-import os
-import fitz
-import asyncio
+import logging
 from dotenv import load_dotenv
-import google.generativeai as genai
-from database.database import gradingCriterias_collection
+from criteria_cache import get_criteria_snapshot
+from llm_client import LLMUnavailableError
+from llm_providers import get_grading_llm
+from essay_text_store import get_essay_text
+from grading_cache import make_cache_key, get_cached_grading, store_grading, cache_stats
+from grading_timing import StageTimer
 import json
-from bson import ObjectId
 import re
 
 load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("API Key không được tìm thấy. Hãy thiết lập biến môi trường GEMINI_API_KEY.")
 
-genai.configure(api_key=API_KEY)
-
-def extract_text_from_pdf(pdf_path):
-    doc = fitz.open(pdf_path)
-    text = "\n".join(page.get_text("text") for page in doc)
-    return text.strip()
+logger = logging.getLogger(__name__)
+
+async def grade_essay_from_pdf(pdf_path, essay_title, selected_criteria_ids=None, temp=0.7, use_cache=True, essay_text=None,
+                               provider=None, timer: StageTimer = None):
+    # timer (tùy chọn) nhận thời gian từng bước và số token, xem grading_timing.py
+    timer = timer or StageTimer()
+    # Văn bản đã trích xuất lúc nộp bài thì dùng lại, không đọc lại PDF
+    if essay_text is None:
+        with timer.stage("extract"):
+            essay_text = (await get_essay_text(pdf_path))["text"]
+    timer.info["text_length"] = len(essay_text or "")
+    if not essay_text:
+        return {"phù_hợp": "Không thể xác định", "điểm_tổng": "Không thể chấm điểm", "giải_thích_chung": f"Không thể trích xuất nội dung từ {pdf_path}."}
 
-def get_grading_criteria(selected_criteria_ids=None):
-    if selected_criteria_ids:
-        criteria_list = list(gradingCriterias_collection.find({"_id": {"$in": [ObjectId(id) for id in selected_criteria_ids]}}))
+    # Dùng một ảnh chụp tiêu chí duy nhất cho cả khóa cache lẫn prompt của bài này
+    with timer.stage("criteria"):
+        snapshot = await get_criteria_snapshot()
+        criteria_list_objects = snapshot.select(selected_criteria_ids)
+
+    # Nhà cung cấp theo cấu hình (GRADING_PROVIDER) hoặc chỉ định riêng cho lần gọi này
+    llm = get_grading_llm(provider)
+    model_identity = llm.identity
+    timer.info["model"] = model_identity
+
+    # Cùng nội dung, đề bài, tiêu chí và cấu hình model thì dùng lại kết quả đã chấm
+    # (khi có dự phòng, khóa tra cứu là của nhà cung cấp chính)
+    cache_key = make_cache_key(essay_text, essay_title, criteria_list_objects, model_identity, temp)
+    if use_cache:
+        try:
+            with timer.stage("cache"):
+                cached_result = await get_cached_grading(cache_key)
+        except Exception:
+            # Không đọc được cache thì chấm bằng AI như bình thường
+            logger.warning("Không thể đọc cache chấm điểm", exc_info=True)
+            cached_result = None
+        if cached_result is not None:
+            timer.info["cached"] = True
+            return cached_result
     else:
-        criteria_list = list(gradingCriterias_collection.find({}))
+        cache_stats["bypassed"] += 1
+    timer.info["cached"] = False
 
-    if not criteria_list:
-        return "Không có tiêu chí chấm điểm cụ thể, chấm điểm theo cảm nhận tổng thể."
+    with timer.stage("prompt"):
+        prompt = _build_prompt(snapshot, selected_criteria_ids, essay_title, essay_text)
+    timer.info["prompt_length"] = len(prompt)
 
-    formatted_criteria = "\n".join(
-        f"- {criteria['name']}: {criteria.get('description', 'Không có mô tả')} (Tối đa {criteria['maxScore']} điểm)"
-        for criteria in criteria_list
-    )
-
-    return f"Chấm theo các tiêu chí sau:\n{formatted_criteria}"
-async def grade_essay_from_pdf(pdf_path, essay_title, selected_criteria_ids=None, temp=0.7):
-    essay_text = extract_text_from_pdf(pdf_path)
-    if not essay_text:
-        return {"phù_hợp": "Không thể xác định", "điểm_tổng": "Không thể chấm điểm", "giải_thích_chung": f"Không thể trích xuất nội dung từ {pdf_path}."}
+    try:
+        with timer.stage("llm"):
+            response = await llm.generate(prompt, temp)
+        timer.info["prompt_tokens"] = response.prompt_tokens
+        timer.info["model"] = response.identity or model_identity
+        timer.info["completion_tokens"] = response.completion_tokens
+        logger.debug("Phản hồi từ %s: %.500s", llm.name, response.text)
+
+        with timer.stage("parse"):
+            json_match = re.search(r'```json\s*(\{.*\})\s*```', response.text, re.DOTALL)
+            json_text = json_match.group(1) if json_match else response.text
+
+            result = json.loads(json_text)
+    except LLMUnavailableError:
+        # Lỗi tạm thời (429, quá tải, hết thời hạn): để bên gọi đánh dấu thất bại thay vì lưu kết quả lỗi
+        raise
+    except json.JSONDecodeError:
+        return {"phù_hợp": "Không thể xác định", "điểm_tổng": "Không thể chấm điểm", "giải_thích_chung": response.text}
+    except Exception as e:
+        return {"phù_hợp": "Không thể xác định", "điểm_tổng": "Không thể chấm điểm", "giải_thích_chung": f"Lỗi khi gọi {llm.name} API: {e}"}
 
-    criteria_list_objects = []
-    if selected_criteria_ids:
-        criteria_list_objects = list(gradingCriterias_collection.find({"_id": {"$in": [ObjectId(id) for id in selected_criteria_ids]}}))
-    else:
-        criteria_list_objects = list(gradingCriterias_collection.find({}))
+    # Chỉ lưu cache kết quả chấm hợp lệ, theo khóa của nhà cung cấp đã thực sự trả lời:
+    # kết quả của nhà cung cấp dự phòng không được trả lại như thể của nhà cung cấp chính
+    answered_by = response.identity or model_identity
+    if answered_by != model_identity:
+        cache_key = make_cache_key(essay_text, essay_title, criteria_list_objects, answered_by, temp)
+    try:
+        with timer.stage("cache"):
+            await store_grading(cache_key, result, answered_by)
+    except Exception:
+        logger.warning("Không thể lưu cache chấm điểm", exc_info=True)
+    return result
 
-    grading_criteria_text = get_grading_criteria(selected_criteria_ids)
 
-    # Tạo phần các tiêu chí động trong prompt và định dạng JSON mẫu
-    criteria_placeholders = ""
-    criteria_results = ""
-    for criteria in criteria_list_objects:
-        criteria_name_snake_case = re.sub(r'\s+', '_', criteria['name']).lower()
-        criteria_placeholders += f'\n    - Mức độ {criteria["name"]} (nếu có trong tiêu chí).'
-        criteria_results += f'\n    "{criteria_name_snake_case}": "[Số điểm]",'
+def _build_prompt(snapshot, selected_criteria_ids, essay_title, essay_text):
+    # Phần mô tả tiêu chí, gợi ý đánh giá và mẫu JSON đã được dựng sẵn theo ảnh chụp
+    grading_criteria_text, criteria_placeholders, criteria_results = snapshot.render(selected_criteria_ids)
 
-    prompt = f"""
+    return f"""
   Bạn là một giáo viên nhiều năm kinh nghiệm, có khả năng chấm điểm đa môn học. 
   Tuy nhiên, với mỗi bài tự luận, bạn phải tuyệt đối tuân thủ đặc thù và yêu cầu của môn học tương ứng.
     Hãy chấm điểm bài tự luận sau theo thang điểm 10, chỉ dựa trên các tiêu chí đã cung cấp của môn học.
@@ -82,18 +121,3 @@ async def grade_essay_from_pdf(pdf_path, essay_title, selected_criteria_ids=None
     {criteria_results}
     }}
     """
-
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    try:
-        response = await model.generate_content_async(prompt, generation_config={"temperature": temp})
-        print("Response from Gemini:", response.text)
-
-        json_match = re.search(r'```json\s*(\{.*\})\s*```', response.text, re.DOTALL)
-        json_text = json_match.group(1) if json_match else response.text
-
-        result = json.loads(json_text)
-        return result
-    except json.JSONDecodeError:
-        return {"phù_hợp": "Không thể xác định", "điểm_tổng": "Không thể chấm điểm", "giải_thích_chung": response.text}
-    except Exception as e:
-        return {"phù_hợp": "Không thể xác định", "điểm_tổng": "Không thể chấm điểm", "giải_thích_chung": f"Lỗi khi gọi Gemini API: {e}"}
\ No newline at end of file
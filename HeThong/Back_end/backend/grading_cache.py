@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from datetime import datetime
+from database.database import gradingCache_collection
+
+# Thời gian sống (giây) và số bản ghi tối đa của cache kết quả chấm AI
+GRADING_CACHE_TTL = int(os.getenv("GRADING_CACHE_TTL", str(30 * 24 * 3600)))
+GRADING_CACHE_MAX_ENTRIES = int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "50000"))
+
+# Bộ đếm trong tiến trình, xem qua /gradings/cache/stats
+cache_stats = {"hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "evicted": 0}
+
+
+def normalize_essay_text(text: str) -> str:
+    # Cùng nội dung nhưng khác cách xuống dòng / khoảng trắng thì cùng khóa
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(essay_text: str, essay_title: str, criteria_list, model_name: str, temperature: float) -> str:
+    """
+    Khóa cache = SHA-256 của nội dung đã chuẩn hóa, đề bài, tiêu chí (id, điểm tối đa, mô tả), model và temperature.
+    """
+    criteria_snapshot = sorted(
+        [str(c["_id"]), c.get("maxScore"), c.get("description")] for c in criteria_list
+    )
+    payload = json.dumps(
+        {
+            "text": normalize_essay_text(essay_text),
+            "title": essay_title.strip(),
+            "criteria": criteria_snapshot,
+            "model": model_name,
+            "temperature": temperature,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def get_cached_grading(cache_key: str):
+    entry = await gradingCache_collection.find_one_and_update(
+        {"_id": cache_key},
+        {"$inc": {"hits": 1}, "$set": {"last_used_at": datetime.now()}},
+        projection={"result": 1}
+    )
+    if entry is None:
+        cache_stats["misses"] += 1
+        return None
+    cache_stats["hits"] += 1
+    return entry["result"]
+
+
+async def store_grading(cache_key: str, result: dict, model_name: str):
+    now = datetime.now()
+    await gradingCache_collection.update_one(
+        {"_id": cache_key},
+        {
+            "$set": {"result": result, "model": model_name, "created_at": now, "last_used_at": now},
+            "$setOnInsert": {"hits": 0},
+        },
+        upsert=True
+    )
+    cache_stats["stores"] += 1
+    await _evict_overflow()
+
+
+async def _evict_overflow():
+    # Vượt quá giới hạn thì xóa các bản ghi lâu không dùng nhất
+    overflow = await gradingCache_collection.estimated_document_count() - GRADING_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+    oldest = await gradingCache_collection.find({}, {"_id": 1}).sort("last_used_at", 1).limit(overflow).to_list(None)
+    result = await gradingCache_collection.delete_many({"_id": {"$in": [e["_id"] for e in oldest]}})
+    cache_stats["evicted"] += result.deleted_count
+
+
+async def get_cache_stats():
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return {
+        **cache_stats,
+        "hit_rate": round(cache_stats["hits"] / lookups, 4) if lookups else None,
+        "entries": await gradingCache_collection.estimated_document_count(),
+        "max_entries": GRADING_CACHE_MAX_ENTRIES,
+        "ttl_seconds": GRADING_CACHE_TTL,
+    }
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from bson import ObjectId
+from database.database import essays_collection, gradings_collection
+from gemini import grade_essay_from_pdf
+from essay_text_store import get_essay_text
+from grading_timing import StageTimer
+from src.essay.model.essay_schema import GradingJobStatus
+
+# Số worker chấm bài chạy song song trong tiến trình (giới hạn số lệnh gọi AI cùng lúc)
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "4"))
+# Thời hạn (giây) một tiến trình giữ bài đang chấm; quá hạn (tiến trình bị tắt giữa chừng) thì tiến trình khác nhận lại
+GRADING_LEASE_SECONDS = float(os.getenv("GRADING_LEASE_SECONDS", "600"))
+# Chu kỳ (giây) quét lại các bài còn chờ hoặc hết hạn giữ để chấm tiếp
+GRADING_RECOVERY_INTERVAL = float(os.getenv("GRADING_RECOVERY_INTERVAL", str(GRADING_LEASE_SECONDS)))
+# Định danh của tiến trình này khi nhận bài (nhiều worker uvicorn / nhiều máy dùng chung database)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_queue = None
+_workers = []
+# Các job đang chờ, theo đúng thứ tự vào hàng đợi (essay_id -> job)
+_waiting = OrderedDict()
+
+
+def _essay_file_path(file_url: str) -> str:
+    # file_url có dạng "/uploads/<tên file>"
+    return file_url.lstrip("/")
+
+
+async def enqueue_grading(essay_id: str, file_path: str, title: str, id_teacher: str, content_hash: str = None):
+    """
+    Đưa bài luận vào hàng đợi chấm điểm. Trả về vị trí trong hàng đợi (bắt đầu từ 1).
+    """
+    if essay_id in _waiting:
+        return get_queue_position(essay_id)
+
+    job = {
+        "essay_id": essay_id,
+        "file_path": file_path,
+        "title": title,
+        "id_teacher": id_teacher,
+        "content_hash": content_hash,
+    }
+    _waiting[essay_id] = job
+    await _queue.put(job)
+    return get_queue_position(essay_id)
+
+
+def get_queue_position(essay_id: str):
+    """
+    Vị trí của bài luận trong hàng đợi (1 là bài tiếp theo được chấm), None nếu không còn chờ.
+    """
+    if essay_id not in _waiting:
+        return None
+    return list(_waiting).index(essay_id) + 1
+
+
+def _unfinished_filter(now: datetime) -> dict:
+    # Bài đang chờ, hoặc đang chấm nhưng tiến trình giữ bài đã hết hạn (hay bài từ trước khi có lease)
+    return {"$or": [
+        {"grading_status": GradingJobStatus.queued.value},
+        {"grading_status": GradingJobStatus.running.value, "grading_lease_until": {"$not": {"$gte": now}}},
+    ]}
+
+
+async def _claim_job(essay_id: str):
+    """
+    Nhận bài để chấm: chuyển queued -> running kèm owner và hạn giữ trong một lệnh nguyên tử,
+    nên mỗi bài chỉ được một tiến trình chấm. Trả về None nếu bài đã bị xóa hoặc tiến trình khác đã nhận.
+    """
+    now = datetime.now()
+    return await essays_collection.find_one_and_update(
+        {"_id": ObjectId(essay_id), **_unfinished_filter(now)},
+        {"$set": {
+            "grading_status": GradingJobStatus.running.value,
+            "grading_owner": WORKER_ID,
+            "grading_started_at": now,
+            "grading_lease_until": now + timedelta(seconds=GRADING_LEASE_SECONDS),
+        }},
+        projection={"_id": 1}
+    )
+
+
+async def _set_job_status(essay_id: str, status: GradingJobStatus, **fields):
+    # Chỉ cập nhật bài tiến trình này đang giữ; matched_count = 0 nếu bài đã bị xóa hoặc bị nhận lại
+    return await essays_collection.update_one(
+        {"_id": ObjectId(essay_id), "grading_owner": WORKER_ID},
+        {"$set": {"grading_status": status.value, **fields}, "$unset": {"grading_lease_until": ""}}
+    )
+
+
+async def _run_job(job: dict):
+    essay_id = job["essay_id"]
+    if await _claim_job(essay_id) is None:
+        logging.info(f"Bỏ qua bài {essay_id}: đã bị xóa hoặc đang được tiến trình khác chấm")
+        return
+
+    # Thời gian từng bước được lưu vào bản chấm điểm (trường timings), xem GET /gradings/timings
+    timer = StageTimer()
+    with timer.stage("extract"):
+        essay_text = await get_essay_text(job["file_path"], job["content_hash"])
+    ai_result = await grade_essay_from_pdf(job["file_path"], job["title"], essay_text=essay_text["text"], timer=timer)
+
+    with timer.stage("db_write"):
+        saved = await essays_collection.update_one(
+            {"_id": ObjectId(essay_id), "grading_owner": WORKER_ID},
+            {"$set": {"ai_score": ai_result}}
+        )
+    if saved.matched_count == 0:
+        # Bài bị xóa trong lúc chấm: không tạo bản chấm điểm mồ côi
+        logging.info(f"Bỏ qua kết quả chấm bài {essay_id}: bài đã bị xóa hoặc bị nhận lại")
+        return
+
+    # Tạo Grading trong một lần ghi: db_write là thời gian ghi kết quả vào bài luận,
+    # thời gian của chính lệnh insert xem ở mongo_command_duration_seconds (GET /metrics)
+    grading_dict = {
+        "id_essay": ObjectId(essay_id),
+        "id_teacher": ObjectId(job["id_teacher"]),
+        "final_score": None,
+        "feedback": None,
+        "ai_score": ai_result,
+        "grading_date": datetime.now(),
+        "timings": timer.as_dict()
+    }
+    await gradings_collection.insert_one(grading_dict)
+
+    await _set_job_status(essay_id, GradingJobStatus.done, grading_finished_at=datetime.now())
+
+
+async def _worker(worker_id: int):
+    while True:
+        job = await _queue.get()
+        _waiting.pop(job["essay_id"], None)
+        try:
+            await _run_job(job)
+        except asyncio.CancelledError:
+            # Job dở dang giữ trạng thái running, sẽ được xếp lại khi khởi động
+            raise
+        except Exception as e:
+            logging.error(f"❌ Worker {worker_id} chấm bài {job['essay_id']} lỗi: {e}")
+            try:
+                await _set_job_status(
+                    job["essay_id"], GradingJobStatus.failed,
+                    grading_error=str(e), grading_finished_at=datetime.now()
+                )
+            except Exception as db_error:
+                logging.error(f"❌ Không thể cập nhật trạng thái job {job['essay_id']}: {db_error}")
+        finally:
+            _queue.task_done()
+
+
+async def _requeue_unfinished():
+    # Bài còn chờ hoặc hết hạn giữ (server tắt giữa chừng) được xếp lại theo thứ tự nộp.
+    # Nhiều tiến trình cùng xếp một bài cũng không sao: chỉ tiến trình nhận được bài (_claim_job) mới chấm
+    unfinished = essays_collection.find(
+        _unfinished_filter(datetime.now()),
+        {"_id": 1, "file_url": 1, "title": 1, "id_teacher": 1, "content_hash": 1}
+    ).sort("submission_date", 1)
+    async for essay in unfinished:
+        await enqueue_grading(
+            str(essay["_id"]), _essay_file_path(essay["file_url"]), essay["title"], str(essay["id_teacher"]),
+            essay.get("content_hash")
+        )
+
+
+async def _recover_periodically():
+    while True:
+        try:
+            await _requeue_unfinished()
+        except Exception as e:
+            logging.error(f"❌ Không thể khôi phục hàng đợi chấm điểm: {e}")
+        await asyncio.sleep(GRADING_RECOVERY_INTERVAL)
+
+
+async def start_grading_workers():
+    global _queue
+    _queue = asyncio.Queue()
+    _waiting.clear()
+    for i in range(max(1, GRADING_WORKERS)):
+        _workers.append(asyncio.create_task(_worker(i)))
+    _workers.append(asyncio.create_task(_recover_periodically()))
+
+
+async def stop_grading_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,155 @@
+"""
+Đo thời gian từng bước của một lần chấm AI (trích xuất văn bản, tiêu chí, dựng prompt, gọi LLM, phân tích kết quả,
+ghi MongoDB) và thống kê p50/p95/p99 theo từng bước từ các bản ghi chấm điểm.
+"""
+import math
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pymongo.errors import OperationFailure
+from database.database import gradings_collection
+
+# Thứ tự các bước trong pipeline chấm điểm
+GRADING_STAGES = ("extract", "criteria", "cache", "prompt", "llm", "parse", "db_write")
+PERCENTILES = (50, 95, 99)
+# Số bản chấm điểm tối đa đọc về khi MongoDB không hỗ trợ $percentile (< 7.0)
+TIMING_SUMMARY_MAX_DOCS = int(os.getenv("TIMING_SUMMARY_MAX_DOCS", "20000"))
+
+
+class StageTimer:
+    """
+    Ghi thời gian (ms) của từng bước và các thông tin kèm theo (số token, độ dài văn bản, ...).
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.info = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    def as_dict(self):
+        return {
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            **self.info,
+        }
+
+
+def percentile(ordered: list, q: float):
+    # Phương pháp nearest-rank trên danh sách đã sắp xếp
+    if not ordered:
+        return None
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+
+def _describe(values: list):
+    values.sort()
+    summary = {"count": len(values)}
+    summary.update({f"p{q}": percentile(values, q) for q in PERCENTILES})
+    summary["max"] = values[-1] if values else None
+    return summary
+
+
+def _ordered_stages(names):
+    return [s for s in GRADING_STAGES if s in names] + sorted(set(names) - set(GRADING_STAGES))
+
+
+def _percentile_group(field: str) -> dict:
+    return {
+        "count": {"$sum": 1},
+        "percentiles": {"$percentile": {"input": field, "p": [q / 100 for q in PERCENTILES], "method": "approximate"}},
+        "max": {"$max": field},
+    }
+
+
+def _from_group(doc: dict) -> dict:
+    summary = {"count": doc["count"]}
+    summary.update({f"p{q}": value for q, value in zip(PERCENTILES, doc["percentiles"])})
+    summary["max"] = doc["max"]
+    return summary
+
+
+async def _summary_server_side(match: dict):
+    # Cần MongoDB 7.0+ ($percentile); chỉ trả về vài document đã gộp thay vì toàn bộ bản chấm điểm
+    pipeline = [
+        {"$match": match},
+        {"$project": {"_id": 0, "timings": 1}},
+        {"$facet": {
+            "overall": [{"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "cached": {"$sum": {"$cond": ["$timings.cached", 1, 0]}},
+                "prompt_tokens": {"$sum": {"$ifNull": ["$timings.prompt_tokens", 0]}},
+                "completion_tokens": {"$sum": {"$ifNull": ["$timings.completion_tokens", 0]}},
+            }}],
+            "stages": [
+                {"$project": {"stage": {"$objectToArray": {"$ifNull": ["$timings.stages_ms", {}]}}}},
+                {"$unwind": "$stage"},
+                {"$group": {"_id": "$stage.k", **_percentile_group("$stage.v")}},
+            ],
+            "total": [
+                {"$match": {"timings.total_ms": {"$type": "number"}}},
+                {"$group": {"_id": None, **_percentile_group("$timings.total_ms")}},
+            ],
+        }},
+    ]
+    result = (await (await gradings_collection.aggregate(pipeline)).to_list(None))[0]
+    overall = result["overall"][0] if result["overall"] else {"count": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    stages = {doc["_id"]: _from_group(doc) for doc in result["stages"]}
+    empty = {"count": 0, **{f"p{q}": None for q in PERCENTILES}, "max": None}
+    return {
+        "count": overall["count"],
+        "cached": overall["cached"],
+        "stages": {name: stages[name] for name in _ordered_stages(stages)},
+        "total": _from_group(result["total"][0]) if result["total"] else empty,
+        "tokens": {"prompt_tokens": overall["prompt_tokens"], "completion_tokens": overall["completion_tokens"]},
+    }
+
+
+async def _summary_in_process(match: dict):
+    # MongoDB cũ (không có $percentile): tính trong tiến trình trên tối đa TIMING_SUMMARY_MAX_DOCS bản gần nhất
+    cursor = gradings_collection.find(match, {"timings": 1, "_id": 0}).sort("grading_date", -1).limit(TIMING_SUMMARY_MAX_DOCS)
+    samples = {}
+    totals = []
+    tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+    count = cached = 0
+    async for doc in cursor:
+        timings = doc["timings"]
+        count += 1
+        cached += 1 if timings.get("cached") else 0
+        for name, ms in (timings.get("stages_ms") or {}).items():
+            samples.setdefault(name, []).append(ms)
+        if timings.get("total_ms") is not None:
+            totals.append(timings["total_ms"])
+        for key in tokens:
+            tokens[key] += timings.get(key) or 0
+    return {
+        "count": count,
+        "cached": cached,
+        "stages": {name: _describe(samples[name]) for name in _ordered_stages(samples)},
+        "total": _describe(totals),
+        "tokens": tokens,
+        "truncated": count >= TIMING_SUMMARY_MAX_DOCS,
+    }
+
+
+async def grading_timing_summary(start: datetime, end: datetime):
+    """
+    Thống kê thời gian từng bước của các lần chấm có grading_date trong [start, end), tính trên MongoDB
+    ($percentile, xấp xỉ). Trả về {"count", "cached", "stages": {bước: {"count", "p50", "p95", "p99", "max"}},
+    "total", "tokens"}.
+    """
+    match = {"grading_date": {"$gte": start, "$lt": end}, "timings": {"$exists": True}}
+    try:
+        summary = await _summary_server_side(match)
+    except OperationFailure:
+        summary = await _summary_in_process(match)
+    return {"start": start, "end": end, **summary}
@@ -0,0 +1,197 @@
+"""
+Bảng định danh dùng chung cho đăng nhập: mỗi email (duy nhất trên mọi vai trò) trỏ tới đúng một
+tài khoản học sinh / giáo viên, kèm hash mật khẩu và các trường cần cho token đăng nhập.
+
+    python -m identity_store --backfill   # tạo định danh cho các tài khoản đã có
+"""
+import argparse
+import asyncio
+import json
+import logging
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database.database import identities_collection, students_collection, teachers_collection
+from database.indexes import ensure_indexes
+
+IDENTITY_ROLES = {
+    "student": students_collection,
+    "teacher": teachers_collection,
+}
+# Trường hồ sơ chép sang định danh để đăng nhập chỉ cần một lần đọc
+PROFILE_FIELDS = ("email", "name", "classinfor", "subject")
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _profile(user: dict) -> dict:
+    return {field: user[field] for field in PROFILE_FIELDS if user.get(field) is not None}
+
+
+def identity_document(role: str, user: dict) -> dict:
+    return {"role": role, "ref_id": user["_id"], "password": user.get("password"), **_profile(user)}
+
+
+async def create_account(role: str, user: dict):
+    """
+    Tạo tài khoản mới: ghi định danh trước để unique index trên email chặn trùng (kể cả khi nhiều
+    người đăng ký cùng lúc), sau đó mới ghi vào collection của vai trò. Email đã dùng thì ném DuplicateKeyError.
+    """
+    user.setdefault("_id", ObjectId())
+    identity = await identities_collection.insert_one(identity_document(role, user))
+    try:
+        await IDENTITY_ROLES[role].insert_one(user)
+    except Exception:
+        # Không để lại định danh trỏ tới tài khoản không tồn tại
+        await identities_collection.delete_one({"_id": identity.inserted_id})
+        raise
+    return user
+
+
+def _write_errors(e: BulkWriteError) -> dict:
+    return {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+
+async def create_accounts(role: str, users: list) -> dict:
+    """
+    Bản hàng loạt của create_account: hai lần insert_many(ordered=False) (định danh rồi tài khoản).
+    Trả về {vị trí trong users: lỗi} cho các tài khoản không tạo được; lỗi trùng email có code 11000.
+    """
+    for user in users:
+        user.setdefault("_id", ObjectId())
+    errors = {}
+    try:
+        await identities_collection.insert_many([identity_document(role, u) for u in users], ordered=False)
+    except BulkWriteError as e:
+        errors.update(_write_errors(e))
+
+    pending = [i for i in range(len(users)) if i not in errors]
+    if not pending:
+        return errors
+    try:
+        await IDENTITY_ROLES[role].insert_many([users[i] for i in pending], ordered=False)
+    except BulkWriteError as e:
+        failed = {pending[index]: error for index, error in _write_errors(e).items()}
+        errors.update(failed)
+        # Không để lại định danh trỏ tới tài khoản không tồn tại
+        await identities_collection.delete_many(
+            {"role": role, "ref_id": {"$in": [users[i]["_id"] for i in failed]}}
+        )
+    return errors
+
+
+async def existing_emails(emails) -> set:
+    # Một truy vấn $in cho cả lô, dùng index email_unique của identities
+    cursor = identities_collection.find({"email": {"$in": list(emails)}}, {"email": 1, "_id": 0})
+    return {doc["email"] for doc in await cursor.to_list(None)}
+
+
+async def update_identity(role: str, ref_id, changes: dict):
+    """
+    Chép các thay đổi hồ sơ / mật khẩu sang định danh. Gọi trước khi cập nhật collection của vai trò:
+    email mới trùng với tài khoản khác thì ném DuplicateKeyError.
+    """
+    fields = _profile(changes)
+    if changes.get("password"):
+        fields["password"] = changes["password"]
+    if fields:
+        await identities_collection.update_one({"role": role, "ref_id": ObjectId(ref_id)}, {"$set": fields})
+
+
+async def delete_identity(role: str, ref_id):
+    await identities_collection.delete_one({"role": role, "ref_id": ObjectId(ref_id)})
+
+
+def _backfill_update(role: str, user: dict):
+    # (bộ lọc, cập nhật) để upsert định danh của một tài khoản đã có
+    return (
+        {"role": role, "ref_id": user["_id"]},
+        {"$set": _profile(user), "$setOnInsert": {"password": user.get("password")}},
+    )
+
+
+async def find_identity(email: str):
+    """
+    Định danh theo email. Tài khoản tạo trước khi có collection identities (chưa chạy --backfill)
+    được tìm lại trong teachers / students và tạo định danh ngay ở lần đăng nhập đầu tiên.
+    """
+    identity = await identities_collection.find_one({"email": email})
+    if identity is not None:
+        return identity
+
+    for role, collection in (("teacher", teachers_collection), ("student", students_collection)):
+        user = await collection.find_one({"email": email}, {"essays": 0, "graded_essays": 0})
+        if user is None:
+            continue
+        try:
+            await identities_collection.update_one(*_backfill_update(role, user), upsert=True)
+        except DuplicateKeyError:
+            # Một request đăng nhập khác vừa tạo định danh này
+            pass
+        return await identities_collection.find_one({"role": role, "ref_id": user["_id"]})
+    return None
+
+
+async def store_rehashed_password(identity: dict, new_hash: str):
+    """
+    Lưu hash mới sau khi băm lại lúc đăng nhập, cho cả định danh lẫn tài khoản của vai trò,
+    để hai bản hash luôn giống nhau.
+    """
+    old_hash = identity["password"]
+    result = await identities_collection.update_one(
+        {"_id": identity["_id"], "password": old_hash}, {"$set": {"password": new_hash}}
+    )
+    if result.modified_count:
+        await IDENTITY_ROLES[identity["role"]].update_one(
+            {"_id": identity["ref_id"]}, {"$set": {"password": new_hash}}
+        )
+
+
+async def backfill_identities():
+    """
+    Tạo hoặc cập nhật định danh cho toàn bộ học sinh / giáo viên hiện có. Hash mật khẩu chỉ chép khi
+    định danh chưa tồn tại (các thay đổi mật khẩu sau đó luôn ghi vào cả hai nơi).
+    Không bắt buộc: đăng nhập tự tạo định danh còn thiếu (xem find_identity).
+    Email trùng giữa các tài khoản được báo lại trong "conflicts" để xử lý thủ công.
+    """
+    report = {}
+    for role, collection in IDENTITY_ROLES.items():
+        counts = {"accounts": 0, "upserted": 0, "conflicts": []}
+        batch, ref_ids = [], []
+
+        async def flush():
+            try:
+                result = await identities_collection.bulk_write(batch, ordered=False)
+                counts["upserted"] += result.upserted_count
+            except BulkWriteError as e:
+                counts["upserted"] += e.details.get("nUpserted", 0)
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    counts["conflicts"].append(str(ref_ids[error["index"]]))
+            batch.clear()
+            ref_ids.clear()
+
+        async for user in collection.find({}, {"essays": 0, "graded_essays": 0}):
+            counts["accounts"] += 1
+            ref_ids.append(user["_id"])
+            batch.append(UpdateOne(*_backfill_update(role, user), upsert=True))
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+        if counts["conflicts"]:
+            logging.warning(f"⚠️ {len(counts['conflicts'])} tài khoản {role} có email trùng với tài khoản khác")
+        report[role] = counts
+    return report
+
+
+async def _main(args):
+    await ensure_indexes()
+    if args.backfill:
+        print(json.dumps(await backfill_identities(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="Tạo định danh cho các tài khoản đã có")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from dotenv import load_dotenv
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from metrics import observe_llm_call
+
+load_dotenv()
+
+# Hạn mức của API: số request và số token mỗi phút
+LLM_RPM = int(os.getenv("LLM_RPM", "15"))
+LLM_TPM = int(os.getenv("LLM_TPM", "1000000"))
+# Số token đầu ra dự kiến mỗi lần gọi (dùng để giữ chỗ trong hạn mức TPM trước khi gọi)
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+# Thử lại với backoff lũy thừa + jitter
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Thời hạn tối đa (giây) cho một lần chấm, tính cả chờ hạn mức và các lần thử lại
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "90"))
+# Circuit breaker: số lỗi liên tiếp để ngắt và thời gian (giây) trước khi cho thử lại
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+
+class LLMUnavailableError(Exception):
+    """
+    Không gọi được LLM: hết lượt thử lại, quá thời hạn hoặc circuit breaker đang mở.
+    """
+
+
+class LLMResponse:
+    def __init__(self, text: str, prompt_tokens: int = None, completion_tokens: int = None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        # "<nhà cung cấp>:<model>" đã thực sự trả lời (gán trong ResilientLLMClient.generate)
+        self.identity = None
+
+
+def estimate_tokens(text: str) -> int:
+    # Ước lượng thô ~4 ký tự/token, đủ để giữ chỗ trong hạn mức TPM
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Token bucket nạp đều theo phút. acquire() chờ cho đến khi đủ token.
+    """
+
+    def __init__(self, per_minute: int, capacity: int = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        # Bù trừ sau khi biết số token thực tế (có thể âm: các lần gọi sau phải chờ lâu hơn)
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def snapshot(self):
+        self._refill()
+        return {"available": round(self.tokens, 1), "capacity": self.capacity, "per_minute": round(self.rate * 60)}
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class ResilientLLMClient:
+    """
+    Lớp cơ sở cho client LLM: giới hạn RPM/TPM, thử lại có backoff, circuit breaker và thời hạn mỗi lần gọi.
+    Lớp con chỉ cần cài đặt _send() và _is_retryable().
+    """
+
+    name = "llm"
+
+    def __init__(self, model_name: str, rpm: int = LLM_RPM, tpm: int = LLM_TPM,
+                 max_retries: int = LLM_MAX_RETRIES, deadline: float = LLM_CALL_DEADLINE):
+        self.model_name = model_name
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "rejected_by_breaker": 0}
+
+    @property
+    def identity(self) -> str:
+        return f"{self.name}:{self.model_name}"
+
+    async def _send(self, prompt: str, temperature: float, timeout: float) -> LLMResponse:
+        raise NotImplementedError
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, asyncio.TimeoutError)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: ngẫu nhiên trong [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    async def generate(self, prompt: str, temperature: float) -> LLMResponse:
+        # Độ trễ (tính cả chờ hạn mức và thử lại) và số token của mỗi lần gọi, xem GET /metrics
+        start = time.monotonic()
+        try:
+            response = await self._generate(prompt, temperature)
+        except Exception as e:
+            observe_llm_call(self.name, time.monotonic() - start, error=e)
+            raise
+        observe_llm_call(self.name, time.monotonic() - start, response=response)
+        response.identity = self.identity
+        return response
+
+    async def _generate(self, prompt: str, temperature: float) -> LLMResponse:
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline
+        self.stats["calls"] += 1
+        reserved_tokens = estimate_tokens(prompt) + LLM_EXPECTED_OUTPUT_TOKENS
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats["rejected_by_breaker"] += 1
+                raise LLMUnavailableError(f"{self.name}: circuit breaker đang mở, tạm ngừng gọi API")
+
+            try:
+                # Chờ đến lượt theo hạn mức RPM/TPM, nhưng không vượt quá thời hạn của lần gọi
+                remaining = deadline_at - loop.time()
+                await asyncio.wait_for(self.request_bucket.acquire(1), timeout=max(0, remaining))
+                remaining = deadline_at - loop.time()
+                await asyncio.wait_for(self.token_bucket.acquire(reserved_tokens), timeout=max(0, remaining))
+            except asyncio.TimeoutError:
+                self.stats["failures"] += 1
+                raise LLMUnavailableError(f"{self.name}: hết thời hạn khi chờ hạn mức RPM/TPM")
+
+            try:
+                remaining = deadline_at - loop.time()
+                response = await asyncio.wait_for(self._send(prompt, temperature, remaining), timeout=max(0, remaining))
+            except Exception as e:
+                retryable = self._is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                if not retryable or attempt >= self.max_retries or loop.time() + delay >= deadline_at:
+                    self.stats["failures"] += 1
+                    if retryable:
+                        raise LLMUnavailableError(f"{self.name}: gọi API thất bại sau {attempt + 1} lần: {e!r}") from e
+                    raise
+                attempt += 1
+                self.stats["retries"] += 1
+                logging.warning(f"⚠️ {self.name}: lỗi {e!r}, thử lại lần {attempt} sau {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.stats["successes"] += 1
+            if response.prompt_tokens is not None and response.completion_tokens is not None:
+                self.token_bucket.adjust(response.prompt_tokens + response.completion_tokens - reserved_tokens)
+            return response
+
+    def get_stats(self):
+        return {
+            "provider": self.name,
+            "model": self.model_name,
+            **self.stats,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "requests_per_minute": self.request_bucket.snapshot(),
+            "tokens_per_minute": self.token_bucket.snapshot(),
+        }
+
+
+class GeminiClient(ResilientLLMClient):
+    name = "gemini"
+
+    RETRYABLE_ERRORS = (
+        google_exceptions.ResourceExhausted,   # 429: vượt hạn mức
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.BadGateway,
+    )
+
+    def __init__(self, model_name: str = None, **kwargs):
+        super().__init__(model_name or os.getenv("GEMINI_MODEL", "gemini-2.0-flash"), **kwargs)
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("API Key không được tìm thấy. Hãy thiết lập biến môi trường GEMINI_API_KEY.")
+
+        # GEMINI_API_ENDPOINT / GEMINI_TRANSPORT cho phép trỏ tới một endpoint giả lập cục bộ khi kiểm thử
+        api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        genai.configure(
+            api_key=api_key,
+            transport=os.getenv("GEMINI_TRANSPORT") or None,
+            client_options={"api_endpoint": api_endpoint} if api_endpoint else None,
+        )
+        # Dùng chung một đối tượng model cho mọi lần gọi
+        self.model = genai.GenerativeModel(self.model_name)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, self.RETRYABLE_ERRORS) or super()._is_retryable(error)
+
+    async def _send(self, prompt: str, temperature: float, timeout: float) -> LLMResponse:
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config={"temperature": temperature},
+            request_options={"timeout": timeout},
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            completion_tokens=getattr(usage, "candidates_token_count", None),
+        )
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import httpx
+from llm_client import ResilientLLMClient, GeminiClient, LLMResponse
+
+# Nhà cung cấp chấm điểm chính và dự phòng: gemini | openai | stub
+GRADING_PROVIDER = os.getenv("GRADING_PROVIDER", "gemini")
+GRADING_FALLBACK_PROVIDER = os.getenv("GRADING_FALLBACK_PROVIDER", "")
+# Ngân sách độ trễ (giây) của nhà cung cấp chính trước khi chuyển sang dự phòng
+GRADING_LATENCY_BUDGET = float(os.getenv("GRADING_LATENCY_BUDGET", "45"))
+# hedge: gọi thêm dự phòng và lấy kết quả về trước; failover: hủy nhà cung cấp chính rồi gọi dự phòng
+GRADING_FAILOVER_MODE = os.getenv("GRADING_FAILOVER_MODE", "hedge")
+
+
+class OpenAICompatibleClient(ResilientLLMClient):
+    """
+    Backend HTTP theo chuẩn OpenAI /chat/completions (OpenRouter, vLLM, Ollama, server giả lập, ...).
+    """
+
+    name = "openai"
+
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, model_name: str = None, **kwargs):
+        super().__init__(model_name or os.getenv("OPENAI_MODEL", "google/gemini-2.0-flash-001"), **kwargs)
+        self.base_url = os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+        api_key = os.getenv("OPENAI_API_KEY") or os.getenv("OPENROUTER_API_KEY")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        # Dùng chung một connection pool cho mọi lần gọi
+        self.http = httpx.AsyncClient(base_url=self.base_url, headers=headers)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.RETRYABLE_STATUS
+        return isinstance(error, httpx.TransportError) or super()._is_retryable(error)
+
+    async def _send(self, prompt: str, temperature: float, timeout: float) -> LLMResponse:
+        response = await self.http.post(
+            "/chat/completions",
+            json={
+                "model": self.model_name,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": temperature,
+            },
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage") or {}
+        return LLMResponse(
+            body["choices"][0]["message"]["content"],
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+
+class StubTransientError(Exception):
+    pass
+
+
+class StubClient(ResilientLLMClient):
+    """
+    Nhà cung cấp giả lập cục bộ, kết quả xác định theo prompt: dùng cho kiểm thử tải khi không có mạng.
+    Độ trễ và tỉ lệ lỗi cấu hình qua STUB_LLM_LATENCY, STUB_LLM_JITTER, STUB_LLM_ERROR_RATE, STUB_LLM_SEED.
+    """
+
+    name = "stub"
+
+    def __init__(self, model_name: str = "stub-grader", **kwargs):
+        kwargs.setdefault("rpm", int(os.getenv("STUB_LLM_RPM", "100000")))
+        kwargs.setdefault("tpm", int(os.getenv("STUB_LLM_TPM", "1000000000")))
+        super().__init__(model_name, **kwargs)
+        self.latency = float(os.getenv("STUB_LLM_LATENCY", "0.5"))
+        self.jitter = float(os.getenv("STUB_LLM_JITTER", "0.2"))
+        self.error_rate = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+        self.rng = random.Random(int(os.getenv("STUB_LLM_SEED", "42")))
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, StubTransientError) or super()._is_retryable(error)
+
+    async def _send(self, prompt: str, temperature: float, timeout: float) -> LLMResponse:
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.rng.random() < self.error_rate:
+            raise StubTransientError("stub: lỗi giả lập (429)")
+
+        # Điểm phụ thuộc duy nhất vào prompt để cùng bài luôn cho cùng kết quả
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        scorer = random.Random(seed)
+        criteria_keys = re.findall(r'"([^"\n]+)": "\[Số điểm\]"', prompt)
+        criteria_keys = [key for key in criteria_keys if key != "điểm_tổng"]
+        result = {
+            "phù_hợp": "Có",
+            "giải_thích_chung": "Kết quả chấm giả lập (stub provider).",
+            "giải_thích_chi_tiết": "Điểm được sinh xác định từ nội dung bài.",
+        }
+        total = 0.0
+        for key in criteria_keys:
+            score = round(scorer.uniform(0, 10 / max(1, len(criteria_keys))), 1)
+            result[key] = str(score)
+            total += score
+        result["điểm_tổng"] = str(round(total if criteria_keys else scorer.uniform(0, 10), 1))
+
+        text = f"```json\n{json.dumps(result, ensure_ascii=False, indent=2)}\n```"
+        return LLMResponse(text, prompt_tokens=len(prompt) // 4, completion_tokens=len(text) // 4)
+
+
+class FailoverClient:
+    """
+    Gọi nhà cung cấp chính; nếu lỗi hoặc vượt ngân sách độ trễ thì chuyển (hoặc gọi song song) sang dự phòng.
+    """
+
+    def __init__(self, primary, secondary, latency_budget: float = GRADING_LATENCY_BUDGET,
+                 mode: str = GRADING_FAILOVER_MODE):
+        self.primary = primary
+        self.secondary = secondary
+        self.latency_budget = latency_budget
+        self.mode = mode
+        self.name = f"{primary.name}>{secondary.name}"
+        self.model_name = f"{primary.model_name}>{secondary.model_name}"
+        self.stats = {"failovers": 0, "hedged": 0, "secondary_wins": 0}
+
+    @property
+    def identity(self) -> str:
+        # Khóa cache theo nhà cung cấp chính; kết quả của dự phòng mang identity của chính nó (LLMResponse.identity)
+        return self.primary.identity
+
+    async def generate(self, prompt: str, temperature: float) -> LLMResponse:
+        primary_task = asyncio.create_task(self.primary.generate(prompt, temperature))
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.latency_budget)
+            if primary_task in done:
+                if primary_task.exception() is None:
+                    return primary_task.result()
+                # Nhà cung cấp chính lỗi: chuyển hẳn sang dự phòng
+                self.stats["failovers"] += 1
+                response = await self.secondary.generate(prompt, temperature)
+                self.stats["secondary_wins"] += 1
+                return response
+
+            secondary_task = asyncio.create_task(self.secondary.generate(prompt, temperature))
+            tasks.add(secondary_task)
+            if self.mode != "hedge":
+                self.stats["failovers"] += 1
+                primary_task.cancel()
+                tasks.discard(primary_task)
+            else:
+                self.stats["hedged"] += 1
+
+            last_error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary_task:
+                            self.stats["secondary_wins"] += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_stats(self):
+        return {
+            "provider": self.name,
+            **self.stats,
+            "latency_budget": self.latency_budget,
+            "mode": self.mode,
+            "primary": self.primary.get_stats(),
+            "secondary": self.secondary.get_stats(),
+        }
+
+
+PROVIDER_CLASSES = {
+    "gemini": GeminiClient,
+    "openai": OpenAICompatibleClient,
+    "stub": StubClient,
+}
+
+# Mỗi nhà cung cấp chỉ tạo một lần để dùng chung hạn mức, circuit breaker và kết nối
+_providers = {}
+_chains = {}
+
+
+def get_provider(name: str):
+    if name not in PROVIDER_CLASSES:
+        raise ValueError(f"Nhà cung cấp chấm điểm không hợp lệ: {name}")
+    if name not in _providers:
+        _providers[name] = PROVIDER_CLASSES[name]()
+    return _providers[name]
+
+
+def get_grading_llm(provider: str = None, fallback: str = None):
+    """
+    Client LLM dùng để chấm bài. Mặc định theo GRADING_PROVIDER / GRADING_FALLBACK_PROVIDER,
+    có thể chọn nhà cung cấp khác cho từng lần gọi.
+    """
+    provider = provider or GRADING_PROVIDER
+    fallback = GRADING_FALLBACK_PROVIDER if fallback is None else fallback
+    if not fallback or fallback == provider:
+        return get_provider(provider)
+
+    key = (provider, fallback)
+    if key not in _chains:
+        _chains[key] = FailoverClient(get_provider(provider), get_provider(fallback))
+    return _chains[key]
+
+
+def get_llm_stats():
+    return {
+        "default_provider": GRADING_PROVIDER,
+        "fallback_provider": GRADING_FALLBACK_PROVIDER or None,
+        "providers": {name: client.get_stats() for name, client in _providers.items()},
+        "failover": {f"{p}>{f}": chain.get_stats() for (p, f), chain in _chains.items()},
+    }
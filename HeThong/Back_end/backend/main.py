@@ -1,4 +1,7 @@
-from fastapi import FastAPI, Request
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware  # Import CORS middleware
 from fastapi.staticfiles import StaticFiles
 from src.student.routes.CURD_student import router as student_router
@@ -7,16 +10,48 @@ from src.gradingCriteria.routes.CURD_gradingCriteria import router as gradingCri
 from src.essay.routes.CURD_essay import router as essay_router
 from src.grading.routes.CURD_grading import router as grading_router
 from src.admin.routes.CURD_admin import router as admin_router
-from database.database import db
+from database.database import db, close_database
 from routes.register import router as register_router  
 from routes.login import router as login_router  
 from routes.login_admin import router as login_admin_router
 from src.dashboard.routes.dashboard import router as dashboard_router
 from src.dashboard.routes.teacher_dashboard import router as teacher_dashboard_router
-from auth import oauth2_scheme
+from src.export.routes.export import router as export_router
+from grading_queue import start_grading_workers, stop_grading_workers
+from pdf_extractor import start_pdf_pool, shutdown_pdf_pool
+from database.indexes import ensure_indexes, explain_hot_queries
+from llm_providers import get_llm_stats
+from responses import MongoJSONResponse
+from auth import shutdown_password_executor
+from src.roster.importer import shutdown_import_executor
+from metrics import HTTP_IN_FLIGHT, CONTENT_TYPE, observe_request, render_metrics, route_label
+from request_log import start_request_log, stop_request_log, log_request
 from dotenv import load_dotenv
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Khởi động log request, pool trích xuất PDF và các worker chấm điểm nền
+    start_request_log()
+    start_pdf_pool()
+    try:
+        await ensure_indexes()
+    except Exception:
+        logger.exception("Không thể tạo index cho database")
+    await start_grading_workers()
+    logger.info("Đã khởi động: pool trích xuất PDF, index và worker chấm điểm")
+    yield
+    logger.info("Đang dừng worker chấm điểm và đóng kết nối")
+    await stop_grading_workers()
+    shutdown_pdf_pool()
+    shutdown_password_executor()
+    shutdown_import_executor()
+    await close_database()
+    stop_request_log()
+
+# Mọi response JSON dùng chung encoder cho ObjectId/datetime (xem responses.py)
+app = FastAPI(lifespan=lifespan, default_response_class=MongoJSONResponse)
 
 load_dotenv()
 # ✅ Thêm CORS middleware
@@ -26,6 +61,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Cho phép tất cả các phương thức (GET, POST, PUT, DELETE, ...)
     allow_headers=["*"],  # Cho phép tất cả các headers
+    expose_headers=["X-Next-Cursor"],  # Cursor trang tiếp theo của các API danh sách
 )
 @app.get("/")
 def read_root():
@@ -35,11 +71,26 @@ def read_root():
 @app.get("/test_db")
 async def test_db():
     try:
-        collections = db.list_collection_names()
+        collections = await db.list_collection_names()
         return {"status": "Connected", "collections": collections}
     except Exception as e:
         return {"status": "Error", "message": str(e)}
     
+# Trạng thái hạn mức, số lần thử lại, circuit breaker và failover của các nhà cung cấp LLM
+@app.get("/llm/stats")
+async def llm_stats():
+    return get_llm_stats()
+
+# Số liệu cho Prometheus: request theo route, độ trễ, lệnh MongoDB, lần gọi LLM
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+# Chạy explain() cho các truy vấn nóng, báo những truy vấn đang quét toàn bộ collection (COLLSCAN)
+@app.get("/diagnostics/query-plans")
+async def query_plans():
+    return await explain_hot_queries()
+
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # Thêm các router
@@ -55,12 +106,21 @@ app.include_router(login_router, prefix="/login")
 app.include_router(login_admin_router, prefix="/login_admin")  
 app.include_router(dashboard_router)
 app.include_router(teacher_dashboard_router)
+app.include_router(export_router)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    print(f"📥 Request: {request.method} {request.url}")
-    print("🔎 Headers:", dict(request.headers))
-    print("🧪 oauth2_scheme:", oauth2_scheme)
-    response = await call_next(request)
-    print(f"📤 Response status: {response.status_code}")
-    return response
\ No newline at end of file
+    # Đo mọi request; chỉ ghi log một phần (lấy mẫu) và không bao giờ ghi token / cookie
+    start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        duration = time.perf_counter() - start
+        route = route_label(request)
+        observe_request(request.method, route, status, duration)
+        log_request(request, route, status, duration)
\ No newline at end of file
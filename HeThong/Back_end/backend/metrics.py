@@ -0,0 +1,171 @@
+"""
+Số liệu vận hành theo định dạng văn bản của Prometheus (GET /metrics): số request và độ trễ theo route,
+số request đang xử lý, số lệnh MongoDB, độ trễ và số token của các lần gọi LLM.
+Cài đặt gọn trong tiến trình, không cần thư viện prometheus_client.
+"""
+import bisect
+import threading
+from pymongo import monitoring
+from starlette.routing import get_route_path
+
+# Ngưỡng (giây) của histogram độ trễ
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+LLM_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value:g}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Số lần quan sát rơi vào từng ngưỡng (chưa cộng dồn), thêm một ô cho +Inf
+                state = self._values[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+
+    def _samples(self):
+        lines = []
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state['sum']:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "Số request HTTP đã xử lý", ("method", "route", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Thời gian xử lý request HTTP", ("method", "route"), HTTP_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Số request HTTP đang xử lý")
+
+MONGO_COMMANDS = Counter("mongo_commands_total", "Số lệnh gửi tới MongoDB", ("command", "outcome"))
+MONGO_LATENCY = Histogram("mongo_command_duration_seconds", "Thời gian thực hiện lệnh MongoDB", ("command",), MONGO_BUCKETS)
+
+LLM_CALLS = Counter("llm_requests_total", "Số lần gọi LLM (tính cả các lần thử lại bên trong)", ("provider", "outcome"))
+LLM_LATENCY = Histogram("llm_request_duration_seconds", "Thời gian một lần gọi LLM", ("provider",), LLM_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "Số token LLM đã dùng", ("provider", "kind"))
+
+
+def route_label(request) -> str:
+    """
+    Mẫu đường dẫn đầy đủ của route (/essays/{essay_id}) thay vì URL thật để số nhãn không tăng theo id.
+    Với router được include, route.path chỉ là phần bên trong router ("/{essay_id}") tùy phiên bản FastAPI:
+    tiền tố là phần đầu của URL mà phần còn lại khớp đúng route.path.
+    """
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    path_regex = getattr(route, "path_regex", None)
+    if template is None:
+        return "unmatched"
+    if path_regex is None:
+        return template
+    path = get_route_path(request.scope)
+    # Route "" (vd. POST /login) khớp phần còn lại rỗng
+    for index in [i for i, char in enumerate(path) if char == "/"] + [len(path)]:
+        if path_regex.match(path[index:]):
+            return path[:index] + template
+    return template
+
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    HTTP_REQUESTS.inc(method, route, str(status))
+    HTTP_LATENCY.observe(duration, method, route)
+
+
+def observe_llm_call(provider: str, duration: float, response=None, error: Exception = None):
+    LLM_CALLS.inc(provider, "error" if error is not None else "success")
+    LLM_LATENCY.observe(duration, provider)
+    if response is not None:
+        if response.prompt_tokens is not None:
+            LLM_TOKENS.inc(provider, "prompt", amount=response.prompt_tokens)
+        if response.completion_tokens is not None:
+            LLM_TOKENS.inc(provider, "completion", amount=response.completion_tokens)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Đếm lệnh MongoDB theo tên lệnh (find, aggregate, insert, ...) và đo thời gian từ sự kiện của driver.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc(event.command_name, "succeeded")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc(event.command_name, "failed")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
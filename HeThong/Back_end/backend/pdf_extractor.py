@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import fitz
+
+# Số tiến trình trích xuất PDF (mặc định bằng số CPU)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+# Giới hạn số trang, số ký tự đọc từ mỗi PDF và thời gian chờ tối đa (giây) cho mỗi tài liệu
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "100"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "200000"))
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "30"))
+
+_pool = None
+
+
+class PdfExtractionError(Exception):
+    pass
+
+
+def extract_text_from_pdf(pdf_path, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS):
+    """
+    Trích xuất văn bản từ PDF (chạy trong tiến trình con). Trả về (text, số trang của tài liệu).
+    """
+    with fitz.open(pdf_path) as doc:
+        parts = []
+        length = 0
+        for page_number, page in enumerate(doc):
+            if page_number >= max_pages or length >= max_chars:
+                break
+            page_text = page.get_text("text")
+            parts.append(page_text)
+            length += len(page_text) + 1
+        page_count = doc.page_count
+    text = "\n".join(parts)[:max_chars]
+    return text.strip(), page_count
+
+
+async def extract_text(pdf_path):
+    """
+    Trích xuất văn bản PDF ngoài event loop. Trả về (text, số trang).
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        # Nếu pool chưa khởi động (script, CLI) thì dùng thread mặc định của loop
+        pool = _pool
+        future = loop.run_in_executor(pool, extract_text_from_pdf, pdf_path, PDF_MAX_PAGES, PDF_MAX_CHARS)
+        try:
+            return await asyncio.wait_for(future, timeout=PDF_EXTRACT_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Tiến trình con vẫn tiếp tục phân tích file lỗi và giữ chỗ trong pool: dừng hẳn và tạo pool mới
+            _recycle_pool(pool)
+            raise PdfExtractionError(f"Quá thời gian trích xuất {pdf_path} ({PDF_EXTRACT_TIMEOUT:g} giây)")
+        except BrokenProcessPool:
+            # Pool bị dừng do một file khác quá thời gian: thử lại một lần trên pool mới
+            if attempt or pool is _pool:
+                raise
+
+
+def _recycle_pool(pool):
+    global _pool
+    if pool is None or pool is not _pool:
+        return
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    logging.warning("⚠️ Trích xuất PDF quá thời gian, khởi động lại pool trích xuất")
+    start_pdf_pool()
+
+
+def start_pdf_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, PDF_WORKERS))
+        logging.info(f"📄 Khởi động {max(1, PDF_WORKERS)} tiến trình trích xuất PDF")
+
+
+def shutdown_pdf_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,69 @@
+"""
+Log request dạng JSON một dòng, có lấy mẫu và che header nhạy cảm.
+Handler thật (ghi ra stdout) chạy trên luồng riêng qua QueueListener: handler của request chỉ đẩy vào hàng đợi.
+"""
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from responses import dumps
+
+# Tỉ lệ lấy mẫu request bình thường (0..1); request lỗi 5xx và request chậm luôn được ghi
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.05"))
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+# Ghi kèm header của request (đã che các header nhạy cảm)
+REQUEST_LOG_HEADERS = os.getenv("REQUEST_LOG_HEADERS", "false").lower() in ("1", "true", "yes")
+REDACTED_HEADERS = {"authorization", "cookie", "set-cookie", "proxy-authorization", "x-api-key"}
+
+logger = logging.getLogger("request")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_log_queue))
+_listener = None
+
+
+def start_request_log():
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_log_queue, logging.StreamHandler(sys.stdout), respect_handler_level=True)
+        _listener.start()
+
+
+def stop_request_log():
+    global _listener
+    if _listener is not None:
+        # Ghi nốt các dòng còn trong hàng đợi
+        _listener.stop()
+        _listener = None
+
+
+def redact_headers(headers) -> dict:
+    return {name: "***" if name.lower() in REDACTED_HEADERS else value for name, value in headers.items()}
+
+
+def should_log(status: int, duration_ms: float) -> bool:
+    if status >= 500 or duration_ms >= REQUEST_LOG_SLOW_MS:
+        return True
+    return random.random() < REQUEST_LOG_SAMPLE_RATE
+
+
+def log_request(request, route: str, status: int, duration: float):
+    duration_ms = duration * 1000
+    if not should_log(status, duration_ms):
+        return
+    entry = {
+        "ts": round(time.time(), 3),
+        "method": request.method,
+        "path": request.url.path,
+        "route": route,
+        "status": status,
+        "duration_ms": round(duration_ms, 2),
+        "client": request.client.host if request.client else None,
+    }
+    if REQUEST_LOG_HEADERS:
+        entry["headers"] = redact_headers(request.headers)
+    logger.info(dumps(entry).decode("utf-8"))
@@ -0,0 +1,48 @@
+import json
+from datetime import date, datetime
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn: thiếu thì dùng json chuẩn (chậm hơn)
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (datetime, date)):
+        # orjson tự xử lý datetime, nhánh này chỉ dùng cho json chuẩn
+        return value.isoformat()
+    raise TypeError(f"Không thể chuyển {type(value).__name__} sang JSON")
+
+
+def dumps(content) -> bytes:
+    """
+    Chuyển document MongoDB (ObjectId, datetime, dict/list lồng nhau) sang JSON trong một lượt.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    Response trả thẳng document MongoDB: ObjectId thành chuỗi, datetime theo ISO 8601,
+    không cần chép lại từng dict/list trước khi trả về hay kiểm tra lại qua response_model.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def with_id(doc: dict, hidden_fields=("password",)):
+    # Đổi _id thành id (giữ ObjectId, encoder tự chuyển sang chuỗi) và bỏ các trường không được trả về
+    doc["id"] = doc.pop("_id")
+    for field in hidden_fields:
+        doc.pop(field, None)
+    return doc
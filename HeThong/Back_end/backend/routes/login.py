@@ -1,42 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from database.database import db, teachers_collection, students_collection
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-import os
-from bson import ObjectId
+from auth import create_access_token, principal_claims, verify_password_async
+from identity_store import find_identity, store_rehashed_password
 
 router = APIRouter()
 
-# Cấu hình JWT
-
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 120
-
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class LoginRequest(BaseModel):
     email: str
     password: str
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 @router.post("")
 async def login_user(login_data: LoginRequest):
-    user = teachers_collection.find_one({"email": login_data.email})
-    if not user:
-        user = students_collection.find_one({"email": login_data.email})
-
+    # Một lần đọc theo index email trên collection định danh (tài khoản cũ chưa có định danh thì tìm trong teachers rồi students)
+    user = await find_identity(login_data.email)
     if not user:
         raise HTTPException(status_code=401, detail="❌ Không tìm thấy tài khoản!")
 
@@ -44,14 +20,17 @@ async def login_user(login_data: LoginRequest):
     if not hashed_password:
         raise HTTPException(status_code=500, detail="❌ User không có mật khẩu!")
 
-    if not verify_password(login_data.password, hashed_password):
+    # bcrypt chạy trên luồng riêng, không chặn các request khác
+    valid, new_hash = await verify_password_async(login_data.password, hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="❌ Mật khẩu không đúng!")
+    if new_hash:
+        # Độ khó bcrypt đã đổi: lưu hash mới vào cả định danh và tài khoản giáo viên / học sinh
+        await store_rehashed_password(user, new_hash)
 
     # Tạo JWT token với _id của người dùng
-    user_id = str(user.get("_id"))
-    print(f"User ID from database: {user_id}")
-    print(f"Type of user ID: {type(user.get('_id'))}")
-    access_token = create_access_token(data={"id": user_id, "role": user.get("role")})
+    user_id = str(user.get("ref_id"))
+    access_token = create_access_token(data={"id": user_id, "role": user.get("role"), **principal_claims(user)})
 
     if user.get("role") == "student":
         return {
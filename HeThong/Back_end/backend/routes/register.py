@@ -3,16 +3,10 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel, validator, EmailStr 
 from pymongo.errors import DuplicateKeyError
 import logging
-from passlib.context import CryptContext  
-from database.database import db
+from auth import hash_password_async
+from identity_store import create_account
 router = APIRouter()
 
-# Tạo đối tượng bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
 # Định nghĩa BaseModel cho việc đăng ký, bao gồm cả trường confirm_password
 class BaseRegistration(BaseModel):
     name: str
@@ -36,16 +30,14 @@ class StudentRegistration(BaseRegistration):
 async def register_teacher(teacher: TeacherRegistration):
     try:
         logging.info("📌 Bắt đầu đăng ký giáo viên")
-        if db.teachers.find_one({"email": teacher.email}):
-            raise HTTPException(status_code=400, detail="Email giáo viên đã tồn tại!")
-
         teacher_data = teacher.dict()
         # Loại bỏ confirm_password trước khi lưu
         teacher_data.pop("confirm_password")
         teacher_data["role"] = "teacher"
-        teacher_data["password"] = hash_password(teacher_data["password"])  # Băm mật khẩu
+        teacher_data["password"] = await hash_password_async(teacher_data["password"])  # Băm mật khẩu
 
-        db.teachers.insert_one(teacher_data)
+        # Email trùng (kể cả với vai trò khác, kể cả khi đăng ký đồng thời) bị unique index chặn -> DuplicateKeyError
+        await create_account("teacher", teacher_data)
         logging.info("✅ Giáo viên đăng ký thành công")
         return {"message": "Đăng ký giáo viên thành công!"}
 
@@ -65,16 +57,14 @@ async def register_teacher(teacher: TeacherRegistration):
 async def register_student(student: StudentRegistration):
     try:
         logging.info("📌 Bắt đầu đăng ký học sinh")
-        if db.students.find_one({"email": student.email}):
-            raise HTTPException(status_code=400, detail="Email học sinh đã tồn tại!")
-
         student_data = student.dict()
         # Loại bỏ confirm_password trước khi lưu
         student_data.pop("confirm_password")
         student_data["role"] = "student"
-        student_data["password"] = hash_password(student_data["password"])  # Băm mật khẩu
+        student_data["password"] = await hash_password_async(student_data["password"])  # Băm mật khẩu
 
-        db.students.insert_one(student_data)
+        # Email trùng (kể cả với vai trò khác, kể cả khi đăng ký đồng thời) bị unique index chặn -> DuplicateKeyError
+        await create_account("student", student_data)
         logging.info("✅ Học sinh đăng ký thành công")
         return {"message": "Đăng ký học sinh thành công!"}
 
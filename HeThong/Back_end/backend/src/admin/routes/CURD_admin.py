@@ -1,34 +1,33 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from src.admin.models.admin_schema import Admin
 from database.database import admins_collection
-from auth import hash_password, get_current_admin #Import hàm mã hóa mật khẩu
+from database.pagination import PageParams, paginate
+from responses import MongoJSONResponse, with_id
+from auth import hash_password_async, get_current_admin, invalidate_principal, load_profile #Import hàm mã hóa mật khẩu
 from bson import ObjectId
 
 router = APIRouter()
 
 # API: Lấy danh sách quản trị viên
 @router.get("/")
-async def get_admins():
-    admins = list(admins_collection.find({}))
-    for admin in admins:
-        admin["id"] = str(admin.pop("_id"))
-    return admins
+async def get_admins(response: Response, page: PageParams = Depends()):
+    admins = await paginate(admins_collection, {}, page, response)
+    return MongoJSONResponse([with_id(admin) for admin in admins], headers=response.headers)
 
 # API: Thêm quản trị viên mới (POST)
 @router.post("/", response_model=Admin)
 async def create_admin(admin: Admin):
-    if admins_collection.find_one({"email": admin.email}):
+    if await admins_collection.find_one({"email": admin.email}):
         raise HTTPException(status_code=400, detail="Email đã tồn tại")
 
     admin_dict = admin.dict(exclude={"id"})
-    admin_dict["password"] = hash_password(admin.password)
+    admin_dict["password"] = await hash_password_async(admin.password)
     admin_dict["role"] = admin.role if admin.role else "admin"
 
-    result = admins_collection.insert_one(admin_dict)
-    admin_dict["id"] = str(result.inserted_id)
-    return admin_dict
+    result = await admins_collection.insert_one(admin_dict)
+    return MongoJSONResponse(with_id(admin_dict))
 
 # API: Cập nhật thông tin quản trị viên (PUT)
 @router.put("/{admin_id}", response_model=Admin)
@@ -39,24 +38,23 @@ async def update_admin(admin_id: str, admin: Admin):
     admin_dict = admin.dict(exclude_unset=True, exclude={"id"})
 
     if "email" in admin_dict:
-        existing_admin = admins_collection.find_one({"email": admin_dict["email"]})
+        existing_admin = await admins_collection.find_one({"email": admin_dict["email"]})
         if existing_admin and str(existing_admin["_id"]) != admin_id:
             raise HTTPException(status_code=400, detail="Email đã tồn tại")
 
     if "role" not in admin_dict:
         admin_dict["role"] = "admin"
 
-    result = admins_collection.update_one(
+    result = await admins_collection.update_one(
         {"_id": ObjectId(admin_id)}, {"$set": admin_dict}
     )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy quản trị viên")
 
-    updated_admin = admins_collection.find_one({"_id": ObjectId(admin_id)})
-    updated_admin["id"] = str(updated_admin.pop("_id"))
-
-    return updated_admin
+    invalidate_principal("admin", admin_id)
+    updated_admin = await admins_collection.find_one({"_id": ObjectId(admin_id)})
+    return MongoJSONResponse(with_id(updated_admin))
 
 # API: Xóa quản trị viên theo ID
 @router.delete("/{admin_id}")
@@ -64,7 +62,8 @@ async def delete_admin(admin_id: str):
     if not ObjectId.is_valid(admin_id):
         raise HTTPException(status_code=400, detail="ID không hợp lệ")
 
-    result = admins_collection.delete_one({"_id": ObjectId(admin_id)})
+    result = await admins_collection.delete_one({"_id": ObjectId(admin_id)})
+    invalidate_principal("admin", admin_id)
 
     if result.deleted_count == 1:
         return {"message": f"Quản trị viên có ID {admin_id} đã được xóa"}
@@ -73,13 +72,11 @@ async def delete_admin(admin_id: str):
 
 @router.get("/me")
 async def get_me_admin(current_admin: dict = Depends(get_current_admin)):
-    print("🔍 Bắt đầu tìm sinh viên trong DB...")
-    admin = admins_collection.find_one({"_id": ObjectId(current_admin["id"])}) # Sửa ở đây
-    print("✅ Truy vấn hoàn tất, kết quả:", admin)
+    # Dùng luôn người dùng đã nạp khi xác thực (có cache), không truy vấn MongoDB lần nữa
+    admin = await load_profile(current_admin)
 
     if admin:
-        admin["id"] = str(admin.pop("_id"))
-        return admin
+        return MongoJSONResponse(admin)
     else:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên")
 # API: Tìm kiếm quản trị viên bằng ID
@@ -88,10 +85,9 @@ async def get_admin_by_id(admin_id: str):
     if not ObjectId.is_valid(admin_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
 
-    admin = admins_collection.find_one({"_id": ObjectId(admin_id)})
+    admin = await admins_collection.find_one({"_id": ObjectId(admin_id)})
 
     if admin is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy quản trị viên")
 
-    admin["id"] = str(admin.pop("_id"))
-    return admin
\ No newline at end of file
+    return MongoJSONResponse(with_id(admin))
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Thống kê cộng dồn (rollup) số bài luận theo ngày, phạm vi và trạng thái.
+
+Mỗi document trong essayStats ứng với một (scope, scope_id, day):
+    {"_id": "teacher:<id>:2025-05-01", "scope": "teacher", "scope_id": ObjectId, "day": "2025-05-01",
+     "total": 3, "counts": {"pending": 1, "approved": 2}}
+và được cập nhật bằng $inc mỗi khi bài luận được tạo, đổi trạng thái hoặc bị xóa.
+
+    python -m src.dashboard.rollup --rebuild   # tính lại toàn bộ từ collection essays
+"""
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from database.database import client, db, essays_collection, essayStats_collection
+from database.indexes import ensure_indexes
+from src.dashboard.stats import GRADED_STATUSES
+from src.essay.model.essay_schema import EssayStatus
+
+KNOWN_STATUSES = [status.value for status in EssayStatus]
+PERIOD_LENGTHS = {"day": 10, "month": 7, "year": 4}  # Độ dài tiền tố của "YYYY-MM-DD"
+REBUILD_COLLECTION = "essayStats_rebuild"
+
+
+def _status_key(status) -> str:
+    # Trạng thái lạ (status là Form tự do) gom vào "other" để không tạo khóa tùy ý
+    status = getattr(status, "value", status)
+    return status if status in KNOWN_STATUSES else "other"
+
+
+def _scopes(essay: dict):
+    return [("global", None), ("teacher", essay.get("id_teacher")), ("student", essay.get("id_student"))]
+
+
+def _rollup_id(scope: str, scope_id, day: str) -> str:
+    return f"{scope}:{scope_id if scope_id is not None else '-'}:{day}"
+
+
+async def _apply(essay: dict, inc: dict):
+    submission_date = essay.get("submission_date")
+    if submission_date is None:
+        return
+    day = submission_date.strftime("%Y-%m-%d")
+    await essayStats_collection.bulk_write([
+        UpdateOne(
+            {"_id": _rollup_id(scope, scope_id, day)},
+            {"$inc": inc, "$setOnInsert": {"scope": scope, "scope_id": scope_id, "day": day}},
+            upsert=True
+        )
+        for scope, scope_id in _scopes(essay)
+    ], ordered=False)
+
+
+async def record_essay_created(essay: dict):
+    await _apply(essay, {"total": 1, f"counts.{_status_key(essay.get('status'))}": 1})
+
+
+async def record_essay_deleted(essay: dict):
+    await _apply(essay, {"total": -1, f"counts.{_status_key(essay.get('status'))}": -1})
+
+
+async def record_status_change(essay: dict, new_status):
+    """
+    essay là bản trước khi cập nhật (cần status, submission_date, id_teacher, id_student).
+    """
+    old_key, new_key = _status_key(essay.get("status")), _status_key(new_status)
+    if old_key != new_key:
+        await _apply(essay, {f"counts.{old_key}": -1, f"counts.{new_key}": 1})
+
+
+async def rollup_series(scope: str, scope_id=None, period: str = "day"):
+    """
+    Chuỗi thống kê theo ngày/tháng/năm đọc từ rollup (số document tỉ lệ với số ngày có bài, không phải số bài).
+    Trả về {"series": [{"time", "total", "pending", "graded"}]}, dùng với src.dashboard.stats.series_points.
+    """
+    docs = await essayStats_collection.find(
+        {"scope": scope, "scope_id": scope_id}, {"_id": 0, "day": 1, "total": 1, "counts": 1}
+    ).sort("day", 1).to_list(None)
+
+    buckets = {}
+    for doc in docs:
+        time = doc["day"][:PERIOD_LENGTHS[period]]
+        bucket = buckets.setdefault(time, {"time": time, "total": 0, "pending": 0, "graded": 0})
+        counts = doc.get("counts", {})
+        bucket["total"] += doc.get("total", 0)
+        bucket["pending"] += counts.get(EssayStatus.pending.value, 0)
+        bucket["graded"] += sum(counts.get(status, 0) for status in GRADED_STATUSES)
+    return {"series": list(buckets.values())}
+
+
+async def rollup_totals(scope: str, scope_id=None):
+    """
+    Số bài tổng/pending/đã chấm của một phạm vi, cộng dồn server-side từ rollup theo index scope_day
+    (không quét collection essays). Trả về {"total", "pending", "graded"}.
+    """
+    pipeline = [
+        {"$match": {"scope": scope, "scope_id": scope_id}},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": "$total"},
+            "pending": {"$sum": {"$ifNull": [f"$counts.{EssayStatus.pending.value}", 0]}},
+            "graded": {"$sum": {"$add": [{"$ifNull": [f"$counts.{status}", 0]} for status in GRADED_STATUSES]}},
+        }},
+    ]
+    result = await (await essayStats_collection.aggregate(pipeline)).to_list(None)
+    counts = result[0] if result else {"total": 0, "pending": 0, "graded": 0}
+    return {"total": counts["total"], "pending": counts["pending"], "graded": counts["graded"]}
+
+
+async def rebuild_rollups():
+    """
+    Tính lại toàn bộ essayStats từ essays (server-side, $out sang collection tạm rồi đổi tên).
+    Các thay đổi xảy ra trong lúc đang tính lại có thể bị mất: nên chạy khi hệ thống ít ghi.
+    """
+    pipeline = [
+        {"$match": {"submission_date": {"$type": "date"}}},
+        {"$project": {
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$submission_date"}},
+            "status": {"$cond": [{"$in": ["$status", KNOWN_STATUSES]}, "$status", "other"]},
+            "scopes": [
+                {"scope": "global", "scope_id": None},
+                {"scope": "teacher", "scope_id": {"$ifNull": ["$id_teacher", None]}},
+                {"scope": "student", "scope_id": {"$ifNull": ["$id_student", None]}},
+            ]
+        }},
+        {"$unwind": "$scopes"},
+        {"$group": {
+            "_id": {"scope": "$scopes.scope", "scope_id": "$scopes.scope_id", "day": "$day", "status": "$status"},
+            "n": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": {"scope": "$_id.scope", "scope_id": "$_id.scope_id", "day": "$_id.day"},
+            "counts": {"$push": {"k": "$_id.status", "v": "$n"}},
+            "total": {"$sum": "$n"}
+        }},
+        {"$project": {
+            "_id": {"$concat": [
+                "$_id.scope", ":", {"$ifNull": [{"$toString": "$_id.scope_id"}, "-"]}, ":", "$_id.day"
+            ]},
+            "scope": "$_id.scope",
+            "scope_id": "$_id.scope_id",
+            "day": "$_id.day",
+            "total": 1,
+            "counts": {"$arrayToObject": "$counts"}
+        }},
+        {"$out": REBUILD_COLLECTION}
+    ]
+    await (await essays_collection.aggregate(pipeline)).to_list(None)
+    await client.admin.command(
+        "renameCollection", f"{db.name}.{REBUILD_COLLECTION}",
+        to=f"{db.name}.{essayStats_collection.name}", dropTarget=True
+    )
+    return await essayStats_collection.estimated_document_count()
+
+
+async def _main(args):
+    print(f"✅ Đã tính lại {await rebuild_rollups()} document thống kê")
+    # Đổi tên collection làm mất index cũ, tạo lại
+    await ensure_indexes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Tính lại essayStats từ collection essays")
+    args = parser.parse_args()
+    if args.rebuild:
+        asyncio.run(_main(args))
+    else:
+        parser.print_help()
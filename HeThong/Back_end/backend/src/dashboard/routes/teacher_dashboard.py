@@ -23,7 +23,7 @@ async def get_submission_stats(stats_data: StatsRequest):
         end_date = datetime.strptime(stats_data.end_date, "%Y-%m-%d")
 
         # Lấy danh sách học sinh theo lớp
-        student_ids = list(students_collection.find({"classinfor": stats_data.class_name}, {"_id": 1, "name": 1}))
+        student_ids = await students_collection.find({"classinfor": stats_data.class_name}, {"_id": 1, "name": 1}).to_list(None)
         if not student_ids:
             return {"message": "❌ Không có học sinh nào trong lớp này!"}
 
@@ -46,7 +46,7 @@ async def get_submission_stats(stats_data: StatsRequest):
             }
         ]
 
-        results = list(essays_collection.aggregate(pipeline))
+        results = await (await essays_collection.aggregate(pipeline)).to_list(None)
 
         # Ghép dữ liệu thống kê với tên học sinh
         stats = {}
@@ -0,0 +1,34 @@
+from database.database import essays_collection
+from src.essay.model.essay_schema import EssayStatus
+
+GRADED_STATUSES = [EssayStatus.approved.value, EssayStatus.rejected.value]
+
+# Đếm tổng / đang xử lý (pending) / đã chấm (approved, rejected) trong cùng một $group
+_STATUS_COUNTERS = {
+    "total": {"$sum": 1},
+    "pending": {"$sum": {"$cond": [{"$eq": ["$status", EssayStatus.pending.value]}, 1, 0]}},
+    "graded": {"$sum": {"$cond": [{"$in": ["$status", GRADED_STATUSES]}, 1, 0]}},
+}
+
+
+async def essay_status_summary(match: dict):
+    """
+    Đếm bài luận tổng/pending/đã chấm của một giáo viên / học sinh trong một lần aggregate.
+    Chỉ đọc trường status nên truy vấn được phục vụ hoàn toàn từ index teacher_status / student_status.
+    Số liệu toàn hệ thống đọc từ rollup (src.dashboard.rollup.rollup_totals), không quét essays.
+    Trả về {"total", "pending", "graded"}.
+    """
+    pipeline = [
+        {"$match": match},
+        {"$project": {"_id": 0, "status": 1}},
+        {"$group": {"_id": None, **_STATUS_COUNTERS}},
+    ]
+
+    result = await (await essays_collection.aggregate(pipeline)).to_list(None)
+    counts = result[0] if result else {"total": 0, "pending": 0, "graded": 0}
+    return {"total": counts["total"], "pending": counts["pending"], "graded": counts["graded"]}
+
+
+def series_points(summary: dict, key: str):
+    # Giữ định dạng cũ của các endpoint: chỉ liệt kê những mốc thời gian có bài
+    return [{"time": item["time"], "value": item[key]} for item in summary["series"] if item[key]]
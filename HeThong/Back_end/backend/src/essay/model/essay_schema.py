@@ -9,6 +9,12 @@ class EssayStatus(str, Enum):
     approved = "approved"
     rejected = "rejected"
 
+class GradingJobStatus(str, Enum):
+    queued = "queued"      # Đã nộp, đang chờ worker chấm
+    running = "running"    # Worker đang trích xuất / gọi AI
+    done = "done"          # Đã chấm xong, có bản ghi grading
+    failed = "failed"      # Chấm lỗi, xem grading_error
+
 class Essay(BaseModel):
     id: Optional[str] = None  # Chuyển từ Optional[ObjectId] sang Optional[str]
     id_student: Optional[str]
@@ -18,6 +24,11 @@ class Essay(BaseModel):
     ai_score: Optional[float] = None
     submission_date: datetime = Field(default_factory=datetime.now)
     status: EssayStatus = EssayStatus.pending
+    grading_status: Optional[GradingJobStatus] = None
+    content_hash: Optional[str] = None  # SHA-256 nội dung file PDF
+    file_size: Optional[int] = None     # Dung lượng file (byte)
+    page_count: Optional[int] = None
+    char_count: Optional[int] = None
 
     class Config:
         json_encoders = {ObjectId: str}  # Tự động chuyển ObjectId thành string
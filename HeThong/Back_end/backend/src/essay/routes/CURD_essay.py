@@ -1,22 +1,27 @@
 import asyncio
 from typing import List
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Response
 from bson import ObjectId
 from datetime import datetime
 import os
-import shutil
-from src.essay.model.essay_schema import EssayStatus
-from database.database import essays_collection, students_collection, teachers_collection, gradings_collection, gradingCriterias_collection
+from src.essay.model.essay_schema import GradingJobStatus
+from database.database import essays_collection, students_collection, teachers_collection, gradings_collection
+from database.pagination import PageParams, paginate
+from responses import MongoJSONResponse
 from gemini import grade_essay_from_pdf
+from grading_queue import enqueue_grading, get_queue_position
+from essay_text_store import get_essay_text
+from blob_store import put_blob, release
+from src.dashboard.stats import essay_status_summary, series_points
+from src.dashboard.rollup import rollup_series, record_essay_created, record_essay_deleted, record_status_change
 from auth import get_current_student, get_current_teacher
 from bson.errors import InvalidId
 router = APIRouter()
-UPLOAD_DIR = "uploads"  # Thư mục lưu file
-
-async def get_all_grading_criteria_ids():
-    cursor = gradingCriterias_collection.find({}, {"_id": 1})
-    criteria = cursor.to_list(None)
-    return [str(c["_id"]) for c in criteria]
+UPLOAD_DIR = "uploads"  # Thư mục lưu file (file mới nằm trong uploads/blobs, xem blob_store)
+# Số bài chấm song song tối đa và thời gian chờ tối đa (giây) cho mỗi bài khi chấm lại hàng loạt
+GRADE_BATCH_CONCURRENCY = int(os.getenv("GRADE_BATCH_CONCURRENCY", "8"))
+GRADE_FILE_TIMEOUT = float(os.getenv("GRADE_FILE_TIMEOUT", "120"))
+ESSAY_SORT_FIELDS = ("_id", "submission_date")
 
 @router.post("/")
 async def create_essay(
@@ -26,122 +31,174 @@ async def create_essay(
     file: UploadFile = File(...),
     status: str = Form("pending")
 ):
-    validate_student_teacher(id_student, id_teacher)
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await validate_student_teacher(id_student, id_teacher)
+    # Lưu file vào kho theo hash nội dung: cùng nội dung thì dùng chung một file (put_blob giữ sẵn một tham chiếu)
+    blob = await put_blob(file)
+
+    # Trích xuất văn bản một lần lúc nộp bài, các lần chấm sau đọc lại theo hash
+    try:
+        essay_text = await get_essay_text(blob["path"], blob["content_hash"])
+    except Exception as e:
+        await release(blob["content_hash"])
+        raise HTTPException(status_code=400, detail=f"Không thể đọc nội dung PDF: {e}")
+
     essay_dict = {
         "id_student": ObjectId(id_student),
         "id_teacher": ObjectId(id_teacher),
         "title": title,
-        "file_url": f"/{UPLOAD_DIR}/{file.filename}",
+        "file_url": blob["file_url"],
+        "original_filename": file.filename,
         "submission_date": datetime.now(),
-        "status": status
+        "status": status,
+        "grading_status": GradingJobStatus.queued.value,
+        "content_hash": blob["content_hash"],
+        "file_size": blob["size"],
+        "page_count": essay_text["page_count"],
+        "char_count": essay_text["char_count"]
     }
-    result = essays_collection.insert_one(essay_dict)
+    try:
+        result = await essays_collection.insert_one(essay_dict)
+    except Exception:
+        await release(blob["content_hash"])
+        raise
     essay_dict["_id"] = result.inserted_id
     essay_id = str(essay_dict["_id"])
+    await record_essay_created(essay_dict)
 
-    # Lấy tất cả ID của tiêu chí chấm điểm
-    criteria_ids = await get_all_grading_criteria_ids()
+    # Chấm điểm AI chạy nền, client theo dõi qua /essays/{id}/grading-status
+    essay_dict["queue_position"] = await enqueue_grading(
+        essay_id, blob["path"], title, id_teacher, content_hash=blob["content_hash"]
+    )
 
-    # Chấm điểm AI
-    try:
-        ai_result = await grade_essay_from_pdf(file_path, title, selected_criteria_ids=criteria_ids)
-        essay_dict["ai_score"] = ai_result
-        # Cập nhật ai_score vào database
-        essays_collection.update_one(
-            {"_id": ObjectId(essay_id)},
-            {"$set": {"ai_score": ai_result}}
-        )
-    except Exception as e:
-        essay_dict["ai_score"] = f"Lỗi chấm điểm AI: {str(e)}"
-
-    # Tạo Grading
-    grading_dict = {
-        "id_essay": ObjectId(essay_id),
-        "id_teacher": ObjectId(id_teacher),
-        "final_score": None, # Hoặc giá trị mặc định
-        "feedback": None, # Hoặc giá trị mặc định
-        "ai_score": essay_dict["ai_score"],
-        "grading_date": datetime.now()
-    }
-    grading_result = gradings_collection.insert_one(grading_dict)
-    grading_dict["_id"] = grading_result.inserted_id
-
-    return convert_objectid(essay_dict)
+    return MongoJSONResponse(essay_dict)
 
 @router.post("/grade")
-async def grade_essays(files: List[UploadFile] = File(...)):
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    results = []
-
-    # Lấy tất cả ID của tiêu chí chấm điểm (chấm lại cũng dùng tất cả)
-    criteria_ids = await get_all_grading_criteria_ids()
-
+async def grade_essays(
+    files: List[UploadFile] = File(...),
+    force: bool = Query(False, description="Bỏ qua cache, bắt buộc chấm lại bằng AI"),
+    id_student: str = Query(None, description="Chỉ tìm bài luận của học sinh này"),
+    id_teacher: str = Query(None, description="Chỉ tìm bài luận gửi giáo viên này")
+):
     for file in files:
         if not file.filename.endswith(".pdf"):
             raise HTTPException(status_code=400, detail=f"File '{file.filename}' không phải PDF.")
 
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
+    scope = {}
+    for field, value in (("id_student", id_student), ("id_teacher", id_teacher)):
+        if value is not None:
+            if not ObjectId.is_valid(value):
+                raise HTTPException(status_code=400, detail=f"{field} không hợp lệ")
+            scope[field] = ObjectId(value)
+
+    # Giới hạn số bài chấm cùng lúc, kết quả trả về theo đúng thứ tự file gửi lên
+    semaphore = asyncio.Semaphore(max(1, GRADE_BATCH_CONCURRENCY))
+    tasks = [_regrade_file(file, semaphore, scope, use_cache=not force) for file in files]
+    return await asyncio.gather(*tasks)
+
+async def _find_single_essay(query: dict):
+    # Trả về (bài luận, số bài khớp tối đa 2): chỉ dùng khi khớp đúng một bài
+    matches = await essays_collection.find(query).sort("submission_date", -1).limit(2).to_list(2)
+    return (matches[0] if len(matches) == 1 else None), len(matches)
+
+async def _regrade_file(file: UploadFile, semaphore: asyncio.Semaphore, scope: dict, use_cache: bool = True):
+    async with semaphore:
+        blob = None
+        repointed = False
         try:
-            essay = essays_collection.find_one({"file_url": f"/{UPLOAD_DIR}/{file.filename}"})
-
-            if essay:
-                essay_title = essay["title"]  # Lấy essay_title từ database
-                score = await grade_essay_from_pdf(file_path, essay_title, selected_criteria_ids=criteria_ids)  # Truyền ID tiêu chí
-                essays_collection.update_one(
-                    {"_id": essay["_id"]},
-                    {"$set": {"ai_score": score}}
-                )
-                results.append({"filename": file.filename, "ai_score": score})
-            else:
-                results.append({"filename": file.filename, "error": "Không tìm thấy bài luận tương ứng."})
+            blob = await put_blob(file)
+
+            # Tìm bài luận theo hash nội dung (nhiều bài có thể dùng chung một file)
+            essay, matched = await _find_single_essay({**scope, "content_hash": blob["content_hash"]})
+            if matched > 1:
+                return {"filename": file.filename,
+                        "error": "Có nhiều bài luận cùng nội dung, hãy chỉ định id_student / id_teacher."}
+            if not essay:
+                # Nội dung đã đổi: chỉ tìm theo tên file gốc trong phạm vi một học sinh / giáo viên,
+                # tránh nhầm sang bài cùng tên file của học sinh khác
+                if not scope:
+                    return {"filename": file.filename,
+                            "error": "Không tìm thấy bài luận cùng nội dung. Cần id_student hoặc id_teacher để tìm theo tên file."}
+                essay, matched = await _find_single_essay({**scope, "$or": [
+                    {"original_filename": file.filename},
+                    {"file_url": f"/{UPLOAD_DIR}/{file.filename}"}  # Bài nộp trước khi có kho theo hash
+                ]})
+                if matched > 1:
+                    return {"filename": file.filename, "error": "Có nhiều bài luận cùng tên file trong phạm vi đã chọn."}
+                if not essay:
+                    return {"filename": file.filename, "error": "Không tìm thấy bài luận tương ứng."}
+                # Tham chiếu put_blob đã giữ chuyển sang bài luận này
+                await _repoint_essay_file(essay, blob)
+                repointed = True
+
+            essay_title = essay["title"]  # Lấy essay_title từ database
+            # Nội dung file không đổi thì dùng văn bản đã lưu, không phân tích lại PDF
+            essay_text = await get_essay_text(blob["path"], blob["content_hash"])
+            score = await asyncio.wait_for(
+                # Chấm lại dùng tất cả tiêu chí (theo ảnh chụp tiêu chí hiện tại)
+                grade_essay_from_pdf(blob["path"], essay_title, use_cache=use_cache, essay_text=essay_text["text"]),
+                timeout=GRADE_FILE_TIMEOUT
+            )
+            await essays_collection.update_one(
+                {"_id": essay["_id"]},
+                {"$set": {
+                    "ai_score": score,
+                    "page_count": essay_text["page_count"],
+                    "char_count": essay_text["char_count"]
+                }}
+            )
+            return {"filename": file.filename, "ai_score": score}
+        except asyncio.TimeoutError:
+            return {"filename": file.filename, "error": f"Quá thời gian chấm ({GRADE_FILE_TIMEOUT:g} giây)."}
+        except HTTPException as e:
+            return {"filename": file.filename, "error": e.detail}
         except Exception as e:
-            results.append({"filename": file.filename, "error": str(e)})
-
-    return results
-
-def convert_objectid(obj):
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    if isinstance(obj, dict):
-        return {k: convert_objectid(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [convert_objectid(v) for v in obj]
-    return obj
-
-def validate_student_teacher(id_student: str, id_teacher: str):
+            return {"filename": file.filename, "error": str(e)}
+        finally:
+            # Bài luận đã trỏ sẵn tới file (hoặc không tìm thấy bài): trả lại tham chiếu put_blob đã giữ
+            if blob is not None and not repointed:
+                await release(blob["content_hash"])
+
+async def _repoint_essay_file(essay: dict, blob: dict):
+    # Bài luận chuyển sang file mới trong kho: tham chiếu của put_blob thuộc về bài này, giảm của file cũ
+    await essays_collection.update_one(
+        {"_id": essay["_id"]},
+        {"$set": {"file_url": blob["file_url"], "content_hash": blob["content_hash"], "file_size": blob["size"]}}
+    )
+    # Thống kê essayStats không đổi: bài luận vẫn giữ trạng thái, ngày nộp, giáo viên và học sinh
+    await release(essay.get("content_hash"))
+
+async def validate_student_teacher(id_student: str, id_teacher: str):
     if not ObjectId.is_valid(id_student):
         raise HTTPException(status_code=400, detail="Student ID không hợp lệ")
     if not ObjectId.is_valid(id_teacher):
         raise HTTPException(status_code=400, detail="Teacher ID không hợp lệ")
 
-    student = students_collection.find_one({"_id": ObjectId(id_student)})
+    student = await students_collection.find_one({"_id": ObjectId(id_student)})
     if not student:
         raise HTTPException(status_code=404, detail="Student ID không tồn tại")
 
-    teacher = teachers_collection.find_one({"_id": ObjectId(id_teacher)})
+    teacher = await teachers_collection.find_one({"_id": ObjectId(id_teacher)})
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher ID không tồn tại")
 
 @router.get("/")
-async def get_all_essays():
-    essays = list(essays_collection.find({}))
-    return [convert_objectid(essay) for essay in essays]
+async def get_all_essays(response: Response, page: PageParams = Depends()):
+    essays = await paginate(essays_collection, {}, page, response, sort_fields=ESSAY_SORT_FIELDS)
+    return MongoJSONResponse(essays, headers=response.headers)
 
 @router.put("/{essay_id}")
 async def update_essay(essay_id: str, title: str = Form(...), status: str = Form(...)):
     if not ObjectId.is_valid(essay_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
     update_data = {"title": title, "status": status}
-    result = essays_collection.update_one({"_id": ObjectId(essay_id)}, {"$set": update_data})
-    if result.modified_count == 0:
+    # Lấy bản trước khi cập nhật để điều chỉnh thống kê theo trạng thái cũ
+    before = await essays_collection.find_one_and_update(
+        {"_id": ObjectId(essay_id)}, {"$set": update_data},
+        projection={"title": 1, "status": 1, "submission_date": 1, "id_teacher": 1, "id_student": 1}
+    )
+    if before is None or (before.get("title") == title and before.get("status") == status):
         raise HTTPException(status_code=404, detail="Không tìm thấy bài luận")
+    await record_status_change(before, status)
     return {"message": "Cập nhật thành công"}
 
 @router.delete("/{essay_id}")
@@ -150,28 +207,41 @@ async def delete_essay(essay_id: str):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
 
     # Xóa Grading liên quan
-    grading_result = gradings_collection.delete_one({"id_essay": ObjectId(essay_id)})
+    grading_result = await gradings_collection.delete_one({"id_essay": ObjectId(essay_id)})
 
     # Xóa Essay
-    essay_result = essays_collection.delete_one({"_id": ObjectId(essay_id)})
+    essay = await essays_collection.find_one_and_delete(
+        {"_id": ObjectId(essay_id)},
+        projection={"content_hash": 1, "status": 1, "submission_date": 1, "id_teacher": 1, "id_student": 1}
+    )
 
-    if essay_result.deleted_count == 0:
+    if essay is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy bài luận")
 
+    # Giảm tham chiếu tới file trong kho, xóa file nếu không còn bài nào dùng
+    await release(essay.get("content_hash"))
+    await record_essay_deleted(essay)
+
     return {"message": "Xóa thành công"}
 
 
 @router.get("/my-essays")
-async def get_my_essays(current_student: dict = Depends(get_current_student)):
+async def get_my_essays(
+    response: Response, page: PageParams = Depends(), current_student: dict = Depends(get_current_student)
+):
     student_id = ObjectId(current_student["id"])
-    essays = list(essays_collection.find({"id_student": student_id}))
-    return [convert_objectid(essay) for essay in essays]
+    essays = await paginate(essays_collection, {"id_student": student_id}, page, response, sort_fields=ESSAY_SORT_FIELDS)
+    return MongoJSONResponse(essays, headers=response.headers)
 
 @router.get("/teacher/essays")
-async def get_essays_for_current_teacher(current_teacher: dict = Depends(get_current_teacher)):
+async def get_essays_for_current_teacher(
+    response: Response, page: PageParams = Depends(), current_teacher: dict = Depends(get_current_teacher)
+):
     teacher_id = current_teacher["id"]
-    essays = list(essays_collection.find({"id_teacher": ObjectId(teacher_id)}))
-    return [convert_objectid(essay) for essay in essays]
+    essays = await paginate(
+        essays_collection, {"id_teacher": ObjectId(teacher_id)}, page, response, sort_fields=ESSAY_SORT_FIELDS
+    )
+    return MongoJSONResponse(essays, headers=response.headers)
 @router.get("/teacher/dashboard/stats")
 async def get_teacher_dashboard_stats(current_teacher: dict = Depends(get_current_teacher)):
     """
@@ -182,25 +252,13 @@ async def get_teacher_dashboard_stats(current_teacher: dict = Depends(get_curren
     except InvalidId:
         raise HTTPException(status_code=400, detail="ID giáo viên không hợp lệ từ token")
 
-    # Đếm tổng số bài được giao
-    total_assigned = essays_collection.count_documents({"id_teacher": teacher_id})
-
-    # Đếm số bài đã chấm (approved hoặc rejected)
-    graded_count = essays_collection.count_documents({
-        "id_teacher": teacher_id,
-        "status": {"$in": [EssayStatus.approved, EssayStatus.rejected]}
-    })
-
-    # Đếm số bài chưa chấm (pending)
-    pending_count = essays_collection.count_documents({
-        "id_teacher": teacher_id,
-        "status": EssayStatus.pending
-    })
+    # Đếm tổng số bài được giao, đã chấm (approved hoặc rejected) và chưa chấm (pending)
+    summary = await essay_status_summary({"id_teacher": teacher_id})
 
     return {
-        "total_assigned": total_assigned,
-        "graded": graded_count,
-        "pending": pending_count
+        "total_assigned": summary["total"],
+        "graded": summary["graded"],
+        "pending": summary["pending"]
     }
 
 @router.get("/teacher/dashboard/stats/all")
@@ -212,63 +270,12 @@ async def get_teacher_stats_by_period(
     Lấy thống kê số lượng bài luận được giao cho giáo viên hiện tại theo khoảng thời gian.
     """
     teacher_id = ObjectId(current_teacher["id"])
-    data = {"total_assigned": [], "graded": [], "pending": []}
-    group_stage = {}
-
-    if period == "day":
-        group_stage = {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$submission_date"}},
-                "count": {"$sum": 1}
-            }
-        }
-    elif period == "month":
-        group_stage = {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m", "date": "$submission_date"}},
-                "count": {"$sum": 1}
-            }
-        }
-    elif period == "year":
-        group_stage = {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y", "date": "$submission_date"}},
-                "count": {"$sum": 1}
-            }
-        }
-
-    sort_stage = {"$sort": {"_id": 1}}
-    match_stage = {"$match": {"id_teacher": teacher_id}}
-
-    # Thống kê tổng số bài được giao
-    total_pipeline = [match_stage, group_stage, sort_stage]
-    total_assigned_data = list(essays_collection.aggregate(total_pipeline))
-    for item in total_assigned_data:
-        data["total_assigned"].append({"time": item["_id"], "value": item["count"]})
-
-    # Thống kê số bài đã chấm
-    graded_pipeline = [
-        match_stage,
-        {"$match": {"status": {"$in": [EssayStatus.approved, EssayStatus.rejected]}}},
-        group_stage,
-        sort_stage
-    ]
-    graded_essays_data = list(essays_collection.aggregate(graded_pipeline))
-    for item in graded_essays_data:
-        data["graded"].append({"time": item["_id"], "value": item["count"]})
-
-    # Thống kê số bài chưa chấm
-    pending_pipeline = [
-        match_stage,
-        {"$match": {"status": EssayStatus.pending}},
-        group_stage,
-        sort_stage
-    ]
-    pending_essays_data = list(essays_collection.aggregate(pending_pipeline))
-    for item in pending_essays_data:
-        data["pending"].append({"time": item["_id"], "value": item["count"]})
-
-    return data
+    summary = await rollup_series("teacher", teacher_id, period=period)
+    return {
+        "total_assigned": series_points(summary, "total"),
+        "graded": series_points(summary, "graded"),
+        "pending": series_points(summary, "pending"),
+    }
 @router.get("/my-stats")
 async def get_my_essay_stats(current_student: dict = Depends(get_current_student)):
     """
@@ -279,25 +286,13 @@ async def get_my_essay_stats(current_student: dict = Depends(get_current_student
     except InvalidId:
          raise HTTPException(status_code=400, detail="ID học sinh không hợp lệ từ token")
 
-    # Đếm tổng số bài đã nộp
-    total_submitted = essays_collection.count_documents({"id_student": student_id})
-
-    # Đếm số bài đang xử lý (pending)
-    pending_count = essays_collection.count_documents({
-        "id_student": student_id,
-        "status": EssayStatus.pending # Hoặc "pending"
-    })
-
-    # Đếm số bài đã xử lý (approved hoặc rejected)
-    processed_count = essays_collection.count_documents({
-        "id_student": student_id,
-        "status": {"$in": [EssayStatus.approved, EssayStatus.rejected]} # Hoặc ["approved", "rejected"]
-    })
+    # Đếm tổng số bài đã nộp, đang xử lý (pending) và đã xử lý (approved hoặc rejected)
+    summary = await essay_status_summary({"id_student": student_id})
 
     return {
-        "total_submitted": total_submitted,
-        "pending": pending_count,
-        "processed": processed_count
+        "total_submitted": summary["total"],
+        "pending": summary["pending"],
+        "processed": summary["graded"]
     }
 @router.get("/my-stats/all")
 async def get_my_stats_by_period(
@@ -308,77 +303,55 @@ async def get_my_stats_by_period(
     Lấy thống kê số lượng bài luận của sinh viên hiện tại theo khoảng thời gian.
     """
     student_id = ObjectId(current_student["id"])
-    data = {"total_submitted": [], "processing": [], "graded": []}
-    group_stage = {}
-
-    if period == "day":
-        group_stage = {
-            "$group": {
-                "_id": { "$dateToString": { "format": "%Y-%m-%d", "date": "$submission_date" } },
-                "count": { "$sum": 1 }
-            }
-        }
-    elif period == "month":
-        group_stage = {
-            "$group": {
-                "_id": { "$dateToString": { "format": "%Y-%m", "date": "$submission_date" } },
-                "count": { "$sum": 1 }
-            }
-        }
-    elif period == "year":
-        group_stage = {
-            "$group": {
-                "_id": { "$dateToString": { "format": "%Y", "date": "$submission_date" } },
-                "count": { "$sum": 1 }
-            }
-        }
-
-    sort_stage = {"$sort": {"_id": 1}}
-    match_stage = {"$match": {"id_student": student_id}}
-
-    # Thống kê tổng số bài đã nộp
-    total_pipeline = [match_stage, group_stage, sort_stage]
-    total_essays_data = list(essays_collection.aggregate(total_pipeline))
-    for item in total_essays_data:
-        data["total_submitted"].append({"time": item["_id"], "value": item["count"]})
-
-    # Thống kê số bài đang xử lý
-    processing_pipeline = [
-        match_stage,
-        {"$match": {"status": EssayStatus.pending}},
-        group_stage,
-        sort_stage
-    ]
-    processing_essays_data = list(essays_collection.aggregate(processing_pipeline))
-    for item in processing_essays_data:
-        data["processing"].append({"time": item["_id"], "value": item["count"]})
-
-    # Thống kê số bài đã chấm
-    graded_pipeline = [
-        match_stage,
-        {"$match": {"status": {"$in": [EssayStatus.approved, EssayStatus.rejected]}}},
-        group_stage,
-        sort_stage
-    ]
-    graded_essays_data = list(essays_collection.aggregate(graded_pipeline))
-    for item in graded_essays_data:
-        data["graded"].append({"time": item["_id"], "value": item["count"]})
-
-    return data
+    summary = await rollup_series("student", student_id, period=period)
+    return {
+        "total_submitted": series_points(summary, "total"),
+        "processing": series_points(summary, "pending"),
+        "graded": series_points(summary, "graded"),
+    }
+@router.get("/{essay_id}/grading-status")
+async def get_grading_status(essay_id: str):
+    """
+    Trạng thái chấm điểm AI của bài luận: queued/running/done/failed và vị trí trong hàng đợi.
+    """
+    if not ObjectId.is_valid(essay_id):
+        raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
+
+    essay = await essays_collection.find_one(
+        {"_id": ObjectId(essay_id)},
+        {"grading_status": 1, "grading_error": 1, "grading_started_at": 1, "grading_finished_at": 1, "ai_score": 1}
+    )
+    if not essay:
+        raise HTTPException(status_code=404, detail="Không tìm thấy bài luận")
+
+    status = essay.get("grading_status")
+    if status is None and "ai_score" in essay:
+        # Bài nộp trước khi có hàng đợi đã được chấm trực tiếp
+        status = GradingJobStatus.done.value
+
+    return {
+        "essay_id": essay_id,
+        "status": status,
+        "queue_position": get_queue_position(essay_id),
+        "error": essay.get("grading_error"),
+        "started_at": essay.get("grading_started_at"),
+        "finished_at": essay.get("grading_finished_at")
+    }
+
 @router.get("/{essay_id}")
 async def get_essay_by_id(essay_id: str):
     if not ObjectId.is_valid(essay_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
     
-    essay = essays_collection.find_one({"_id": ObjectId(essay_id)})
+    essay = await essays_collection.find_one({"_id": ObjectId(essay_id)})
     if not essay:
         raise HTTPException(status_code=404, detail="Không tìm thấy bài luận")
 
     # Lấy thêm thông tin student và teacher nếu cần
-    student = students_collection.find_one({"_id": essay["id_student"]})
-    teacher = teachers_collection.find_one({"_id": essay["id_teacher"]})
+    student = await students_collection.find_one({"_id": essay["id_student"]}, {"name": 1})
+    teacher = await teachers_collection.find_one({"_id": essay["id_teacher"]}, {"name": 1})
 
     essay["student_name"] = student["name"] if student else None
     essay["teacher_name"] = teacher["name"] if teacher else None
 
-    return convert_objectid(essay)
\ No newline at end of file
+    return MongoJSONResponse(essay)
\ No newline at end of file
@@ -0,0 +1,229 @@
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from database.database import essays_collection, gradings_collection, students_collection, teachers_collection
+from criteria_cache import get_criteria_snapshot, criteria_result_key
+from responses import dumps
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+# Số document MongoDB trả về mỗi lượt đọc cursor khi xuất dữ liệu
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+AI_TOTAL_KEY = "điểm_tổng"
+
+GRADING_COLUMNS = [
+    "grading_id", "essay_id", "essay_title", "student_name", "student_email", "class",
+    "teacher_name", "submission_date", "grading_date", "final_score", "feedback", "ai_total",
+]
+ESSAY_COLUMNS = [
+    "essay_id", "title", "student_name", "student_email", "class", "teacher_name",
+    "submission_date", "status", "grading_status", "ai_total", "file_url",
+]
+
+# Chỉ lấy các trường cần xuất từ students/teachers (không bao giờ lấy password)
+_STUDENT_LOOKUP = [{"$project": {"name": 1, "email": 1, "classinfor": 1}}]
+_TEACHER_LOOKUP = [{"$project": {"name": 1}}]
+
+
+def _parse_date(value: Optional[str], field: str):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} phải có dạng YYYY-MM-DD")
+
+
+def _date_range(start_date: Optional[str], end_date: Optional[str]):
+    date_range = {}
+    start = _parse_date(start_date, "start_date")
+    end = _parse_date(end_date, "end_date")
+    if start:
+        date_range["$gte"] = start
+    if end:
+        # Bao gồm cả ngày kết thúc
+        date_range["$lt"] = end + timedelta(days=1)
+    return date_range
+
+
+async def _class_student_ids(class_name: str):
+    students = await students_collection.find({"classinfor": class_name}, {"_id": 1}).to_list(None)
+    return [s["_id"] for s in students]
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+def _ai_total(ai_score):
+    return ai_score.get(AI_TOTAL_KEY) if isinstance(ai_score, dict) else ai_score
+
+
+async def _stream(cursor, to_row, columns, fmt: str):
+    """
+    Ghi từng document ra ngay khi đọc được từ cursor: bộ nhớ không phụ thuộc số bản ghi.
+    """
+    if fmt == "ndjson":
+        async for doc in cursor:
+            yield dumps(to_row(doc)) + b"\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM để Excel nhận đúng tiếng Việt (UTF-8)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    async for doc in cursor:
+        row = to_row(doc)
+        writer.writerow([_csv_value(row.get(c)) for c in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _response(generator, fmt: str, name: str):
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/csv; charset=utf-8"
+    filename = f"{name}_{datetime.now():%Y%m%d_%H%M%S}.{'ndjson' if fmt == 'ndjson' else 'csv'}"
+    return StreamingResponse(
+        generator, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _validate_teacher_id(teacher_id: Optional[str]):
+    if teacher_id and not ObjectId.is_valid(teacher_id):
+        raise HTTPException(status_code=400, detail="Teacher ID không hợp lệ")
+
+
+@router.get("/gradings")
+async def export_gradings(
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    class_name: Optional[str] = Query(None, description="Lớp của học sinh (classinfor)"),
+    teacher_id: Optional[str] = None,
+    start_date: Optional[str] = Query(None, description="Từ ngày chấm (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Đến ngày chấm (YYYY-MM-DD)"),
+):
+    """
+    Xuất toàn bộ bản chấm điểm kèm tên bài, học sinh, lớp, giáo viên và điểm AI từng tiêu chí.
+    """
+    _validate_teacher_id(teacher_id)
+    match = {}
+    if teacher_id:
+        match["id_teacher"] = ObjectId(teacher_id)
+    date_range = _date_range(start_date, end_date)
+    if date_range:
+        match["grading_date"] = date_range
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"grading_date": 1, "_id": 1}},
+        {"$lookup": {"from": essays_collection.name, "localField": "id_essay", "foreignField": "_id",
+                     "pipeline": [{"$project": {"title": 1, "id_student": 1, "submission_date": 1}}],
+                     "as": "essay"}},
+        {"$unwind": {"path": "$essay", "preserveNullAndEmptyArrays": True}},
+    ]
+    if class_name:
+        pipeline.append({"$match": {"essay.id_student": {"$in": await _class_student_ids(class_name)}}})
+    pipeline += [
+        {"$lookup": {"from": students_collection.name, "localField": "essay.id_student", "foreignField": "_id",
+                     "pipeline": _STUDENT_LOOKUP, "as": "student"}},
+        {"$lookup": {"from": teachers_collection.name, "localField": "id_teacher", "foreignField": "_id",
+                     "pipeline": _TEACHER_LOOKUP, "as": "teacher"}},
+        {"$unwind": {"path": "$student", "preserveNullAndEmptyArrays": True}},
+        {"$unwind": {"path": "$teacher", "preserveNullAndEmptyArrays": True}},
+    ]
+
+    # Mỗi tiêu chí hiện có là một cột điểm trong CSV
+    snapshot = await get_criteria_snapshot()
+    criteria_keys = [criteria_result_key(c["name"]) for c in snapshot.criteria]
+    columns = GRADING_COLUMNS + criteria_keys
+
+    def to_row(doc):
+        essay = doc.get("essay") or {}
+        student = doc.get("student") or {}
+        ai_score = doc.get("ai_score")
+        row = {
+            "grading_id": doc["_id"],
+            "essay_id": doc.get("id_essay"),
+            "essay_title": essay.get("title"),
+            "student_name": student.get("name"),
+            "student_email": student.get("email"),
+            "class": student.get("classinfor"),
+            "teacher_name": (doc.get("teacher") or {}).get("name"),
+            "submission_date": essay.get("submission_date"),
+            "grading_date": doc.get("grading_date"),
+            "final_score": doc.get("final_score"),
+            "feedback": doc.get("feedback"),
+            "ai_total": _ai_total(ai_score),
+        }
+        if format == "ndjson":
+            row["ai_score"] = ai_score
+        elif isinstance(ai_score, dict):
+            row.update({key: ai_score.get(key) for key in criteria_keys})
+        return row
+
+    cursor = await gradings_collection.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE)
+    return _response(_stream(cursor, to_row, columns, format), format, "gradings")
+
+
+@router.get("/essays")
+async def export_essays(
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    class_name: Optional[str] = Query(None, description="Lớp của học sinh (classinfor)"),
+    teacher_id: Optional[str] = None,
+    start_date: Optional[str] = Query(None, description="Từ ngày nộp (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Đến ngày nộp (YYYY-MM-DD)"),
+):
+    """
+    Xuất danh sách bài luận kèm học sinh, lớp, giáo viên, trạng thái và tổng điểm AI.
+    """
+    _validate_teacher_id(teacher_id)
+    match = {}
+    if teacher_id:
+        match["id_teacher"] = ObjectId(teacher_id)
+    if class_name:
+        match["id_student"] = {"$in": await _class_student_ids(class_name)}
+    date_range = _date_range(start_date, end_date)
+    if date_range:
+        match["submission_date"] = date_range
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"submission_date": 1, "_id": 1}},
+        {"$lookup": {"from": students_collection.name, "localField": "id_student", "foreignField": "_id",
+                     "pipeline": _STUDENT_LOOKUP, "as": "student"}},
+        {"$lookup": {"from": teachers_collection.name, "localField": "id_teacher", "foreignField": "_id",
+                     "pipeline": _TEACHER_LOOKUP, "as": "teacher"}},
+        {"$unwind": {"path": "$student", "preserveNullAndEmptyArrays": True}},
+        {"$unwind": {"path": "$teacher", "preserveNullAndEmptyArrays": True}},
+    ]
+
+    def to_row(doc):
+        student = doc.get("student") or {}
+        row = {
+            "essay_id": doc["_id"],
+            "title": doc.get("title"),
+            "student_name": student.get("name"),
+            "student_email": student.get("email"),
+            "class": student.get("classinfor"),
+            "teacher_name": (doc.get("teacher") or {}).get("name"),
+            "submission_date": doc.get("submission_date"),
+            "status": doc.get("status"),
+            "grading_status": doc.get("grading_status"),
+            "ai_total": _ai_total(doc.get("ai_score")),
+            "file_url": doc.get("file_url"),
+        }
+        if format == "ndjson":
+            row["ai_score"] = doc.get("ai_score")
+        return row
+
+    cursor = await essays_collection.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE)
+    return _response(_stream(cursor, to_row, ESSAY_COLUMNS, format), format, "essays")
@@ -1,57 +1,63 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response, Query
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.grading.models.grading_schema import Grading
 from database.database import gradings_collection, essays_collection, teachers_collection
+from database.pagination import PageParams, paginate
+from responses import MongoJSONResponse, with_id
 from auth import get_current_teacher
+from grading_cache import get_cache_stats
+from grading_timing import grading_timing_summary
 router = APIRouter()
+GRADING_SORT_FIELDS = ("_id", "grading_date")
 
-def convert_objectid(obj):
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    if isinstance(obj, dict):
-        return {k: convert_objectid(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [convert_objectid(v) for v in obj]
-    return obj
-
-def validate_essay_teacher(id_essay: str, id_teacher: str):
+async def validate_essay_teacher(id_essay: str, id_teacher: str):
     if not ObjectId.is_valid(id_essay):
         raise HTTPException(status_code=400, detail="Essay ID không hợp lệ")
     if not ObjectId.is_valid(id_teacher):
         raise HTTPException(status_code=400, detail="Teacher ID không hợp lệ")
 
-    essay = essays_collection.find_one({"_id": ObjectId(id_essay)})
+    essay = await essays_collection.find_one({"_id": ObjectId(id_essay)})
     if not essay:
         raise HTTPException(status_code=404, detail="Essay ID không tồn tại")
 
-    teacher = teachers_collection.find_one({"_id": ObjectId(id_teacher)})
+    teacher = await teachers_collection.find_one({"_id": ObjectId(id_teacher)})
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher ID không tồn tại")
 
 @router.get("/")
-async def get_gradings():
-    gradings = list(gradings_collection.find({}))
-    for grading in gradings:
-        grading["id"] = str(grading["_id"])
-        grading["id_essay"] = str(grading["id_essay"])
-        grading["id_teacher"] = str(grading["id_teacher"])
-        grading.pop("_id", None)
-    return gradings
+async def get_gradings(response: Response, page: PageParams = Depends()):
+    gradings = await paginate(gradings_collection, {}, page, response, sort_fields=GRADING_SORT_FIELDS)
+    return MongoJSONResponse([with_id(grading) for grading in gradings], headers=response.headers)
 
 @router.get("/me")
-async def get_my_gradings(current_teacher: dict = Depends(get_current_teacher)):
+async def get_my_gradings(
+    response: Response, page: PageParams = Depends(), current_teacher: dict = Depends(get_current_teacher)
+):
     """
     Lấy danh sách các bài chấm điểm của giáo viên đang đăng nhập.
     """
     teacher_id = current_teacher["id"]
-    gradings = list(gradings_collection.find({"id_teacher": ObjectId(teacher_id)}))
-    for grading in gradings:
-        grading["id"] = str(grading["_id"])
-        grading["id_essay"] = str(grading["id_essay"])
-        grading["id_teacher"] = str(grading["id_teacher"])
-        grading.pop("_id", None)
-    return gradings
+    gradings = await paginate(
+        gradings_collection, {"id_teacher": ObjectId(teacher_id)}, page, response, sort_fields=GRADING_SORT_FIELDS
+    )
+    return MongoJSONResponse([with_id(grading) for grading in gradings], headers=response.headers)
+
+@router.get("/cache/stats")
+async def get_grading_cache_stats():
+    """
+    Thống kê cache kết quả chấm AI: số lần hit/miss, số bản ghi, giới hạn.
+    """
+    return await get_cache_stats()
+
+@router.get("/timings")
+async def get_grading_timings(hours: float = Query(24, gt=0, le=24 * 90, description="Khoảng thời gian tính đến hiện tại (giờ)")):
+    """
+    Thời gian từng bước của pipeline chấm AI (extract, criteria, cache, prompt, llm, parse, db_write):
+    p50/p95/p99 theo từng bước, tổng số token, trong khoảng thời gian gần nhất.
+    """
+    end = datetime.now()
+    return await grading_timing_summary(end - timedelta(hours=hours), end)
 
 @router.get("/essay/{essay_id}")
 async def get_gradings_by_essay_id(essay_id: str):
@@ -61,23 +67,18 @@ async def get_gradings_by_essay_id(essay_id: str):
     if not ObjectId.is_valid(essay_id):
         raise HTTPException(status_code=400, detail="Essay ID không hợp lệ")
 
-    gradings = list(gradings_collection.find({"id_essay": ObjectId(essay_id)}))
+    gradings = await gradings_collection.find({"id_essay": ObjectId(essay_id)}).to_list(None)
     if not gradings:
         raise HTTPException(status_code=404, detail=f"Không tìm thấy chấm điểm nào cho Essay ID: {essay_id}")
 
-    for grading in gradings:
-        grading["id"] = str(grading["_id"])
-        grading["id_essay"] = str(grading["id_essay"])
-        grading["id_teacher"] = str(grading["id_teacher"])
-        grading.pop("_id", None)
-    return gradings
+    return MongoJSONResponse([with_id(grading) for grading in gradings])
 
 @router.post("/")
 async def create_grading(grading: Grading):
-    validate_essay_teacher(grading.id_essay, grading.id_teacher)
+    await validate_essay_teacher(grading.id_essay, grading.id_teacher)
     
     # Tìm bài essay để lấy ai_score
-    essay = essays_collection.find_one({"_id": ObjectId(grading.id_essay)})
+    essay = await essays_collection.find_one({"_id": ObjectId(grading.id_essay)})
     if not essay:
         raise HTTPException(status_code=404, detail="Không tìm thấy bài essay")
     
@@ -91,12 +92,10 @@ async def create_grading(grading: Grading):
     # Gán ai_score từ essay vào grading
     grading_dict["ai_score"] = ai_score  
 
-    result = gradings_collection.insert_one(grading_dict)
-    grading_dict["id"] = str(result.inserted_id)
-    grading_dict["id_essay"] = str(grading_dict["id_essay"])
-    grading_dict["id_teacher"] = str(grading_dict["id_teacher"])
-    
-    return convert_objectid(grading_dict)
+    result = await gradings_collection.insert_one(grading_dict)
+    grading_dict["id"] = result.inserted_id
+
+    return MongoJSONResponse(grading_dict)
 
 
 @router.put("/{grading_id}")
@@ -104,7 +103,7 @@ async def update_grading(grading_id: str, grading: Grading):
     if not ObjectId.is_valid(grading_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
     
-    validate_essay_teacher(grading.id_essay, grading.id_teacher)
+    await validate_essay_teacher(grading.id_essay, grading.id_teacher)
     
     grading_dict = grading.dict(exclude_unset=True, exclude={"id"})
     if "id_essay" in grading_dict:
@@ -112,7 +111,7 @@ async def update_grading(grading_id: str, grading: Grading):
     if "id_teacher" in grading_dict:
         grading_dict["id_teacher"] = ObjectId(grading_dict["id_teacher"])
     
-    result = gradings_collection.update_one({"_id": ObjectId(grading_id)}, {"$set": grading_dict})
+    result = await gradings_collection.update_one({"_id": ObjectId(grading_id)}, {"$set": grading_dict})
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy chấm điểm")
     
@@ -123,7 +122,7 @@ async def delete_grading(grading_id: str):
     if not ObjectId.is_valid(grading_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
     
-    result = gradings_collection.delete_one({"_id": ObjectId(grading_id)})
+    result = await gradings_collection.delete_one({"_id": ObjectId(grading_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy chấm điểm")
     
@@ -134,12 +133,8 @@ async def get_grading_by_id(grading_id: str):
     if not ObjectId.is_valid(grading_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
     
-    grading = gradings_collection.find_one({"_id": ObjectId(grading_id)})
+    grading = await gradings_collection.find_one({"_id": ObjectId(grading_id)})
     if not grading:
         raise HTTPException(status_code=404, detail="Không tìm thấy chấm điểm")
     
-    grading["id"] = str(grading["_id"])
-    grading["id_essay"] = str(grading["id_essay"])
-    grading["id_teacher"] = str(grading["id_teacher"])
-    grading.pop("_id", None)
-    return grading
+    return MongoJSONResponse(with_id(grading))
@@ -1,30 +1,31 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Response
 from src.gradingCriteria.models.gradingCriteria_schema import GradingCriteria
 from database.database import gradingCriterias_collection
+from database.pagination import PageParams, paginate
+from responses import MongoJSONResponse, with_id
 from bson import ObjectId
+from criteria_cache import invalidate_criteria_cache
 
 router = APIRouter()
 
 # API: Lấy danh sách tiêu chí chấm điểm
-@router.get("/", response_model=List[GradingCriteria])
-async def get_gradingCriterias():
-    gradingCriterias = list(gradingCriterias_collection.find({}))
-    for gradingCriteria in gradingCriterias:
-        gradingCriteria["id"] = str(gradingCriteria.pop("_id"))
-    return gradingCriterias
+@router.get("/")
+async def get_gradingCriterias(response: Response, page: PageParams = Depends()):
+    gradingCriterias = await paginate(gradingCriterias_collection, {}, page, response, sort_fields=("_id", "name"))
+    return MongoJSONResponse([with_id(gradingCriteria) for gradingCriteria in gradingCriterias], headers=response.headers)
 
 # API: Thêm tiêu chí chấm điểm mới (POST)
 @router.post("/", response_model=GradingCriteria)
 async def create_gradingCriteria(gradingCriteria: GradingCriteria):
-    if gradingCriterias_collection.find_one({"name": gradingCriteria.name}):
+    if await gradingCriterias_collection.find_one({"name": gradingCriteria.name}):
         raise HTTPException(status_code=400, detail="Tên tiêu chí đã tồn tại")
 
     gradingCriteria_dict = gradingCriteria.dict(exclude={"id"})
-    result = gradingCriterias_collection.insert_one(gradingCriteria_dict)
-    gradingCriteria_dict["id"] = str(result.inserted_id)
-    return gradingCriteria_dict
+    result = await gradingCriterias_collection.insert_one(gradingCriteria_dict)
+    await invalidate_criteria_cache()
+    return MongoJSONResponse(with_id(gradingCriteria_dict))
 
 # API: Cập nhật thông tin tiêu chí chấm điểm (PUT)
 @router.put("/{gradingCriteria_id}", response_model=GradingCriteria)
@@ -32,20 +33,20 @@ async def update_gradingCriteria(gradingCriteria_id: str, gradingCriteria: Gradi
     if not ObjectId.is_valid(gradingCriteria_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
 
-    if gradingCriterias_collection.find_one({"name": gradingCriteria.name, "_id": {"$ne": ObjectId(gradingCriteria_id)}}):
+    if await gradingCriterias_collection.find_one({"name": gradingCriteria.name, "_id": {"$ne": ObjectId(gradingCriteria_id)}}):
         raise HTTPException(status_code=400, detail="Tên tiêu chí đã tồn tại")
 
     gradingCriteria_dict = gradingCriteria.dict(exclude_unset=True, exclude={"id"})
-    result = gradingCriterias_collection.update_one(
+    result = await gradingCriterias_collection.update_one(
         {"_id": ObjectId(gradingCriteria_id)}, {"$set": gradingCriteria_dict}
     )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy tiêu chí chấm điểm")
+    await invalidate_criteria_cache()
 
-    updated_gradingCriteria = gradingCriterias_collection.find_one({"_id": ObjectId(gradingCriteria_id)})
-    updated_gradingCriteria["id"] = str(updated_gradingCriteria.pop("_id"))
-    return updated_gradingCriteria
+    updated_gradingCriteria = await gradingCriterias_collection.find_one({"_id": ObjectId(gradingCriteria_id)})
+    return MongoJSONResponse(with_id(updated_gradingCriteria))
 
 # API: Xóa tiêu chí chấm điểm theo ID
 @router.delete("/{gradingCriteria_id}")
@@ -53,9 +54,10 @@ async def delete_gradingCriteria(gradingCriteria_id: str):
     if not ObjectId.is_valid(gradingCriteria_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
 
-    result = gradingCriterias_collection.delete_one({"_id": ObjectId(gradingCriteria_id)})
+    result = await gradingCriterias_collection.delete_one({"_id": ObjectId(gradingCriteria_id)})
 
     if result.deleted_count == 1:
+        await invalidate_criteria_cache()
         return {"message": f"Tiêu chí chấm điểm có ID {gradingCriteria_id} đã được xóa"}
     else:
         raise HTTPException(status_code=404, detail="Không tìm thấy tiêu chí chấm điểm")
@@ -66,10 +68,9 @@ async def get_gradingCriteria_by_id(gradingCriteria_id: str):
     if not ObjectId.is_valid(gradingCriteria_id):
         raise HTTPException(status_code=400, detail="Định dạng ID không hợp lệ")
 
-    gradingCriteria = gradingCriterias_collection.find_one({"_id": ObjectId(gradingCriteria_id)})
+    gradingCriteria = await gradingCriterias_collection.find_one({"_id": ObjectId(gradingCriteria_id)})
 
     if gradingCriteria is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy tiêu chí chấm điểm")
 
-    gradingCriteria["id"] = str(gradingCriteria.pop("_id"))
-    return gradingCriteria
\ No newline at end of file
+    return MongoJSONResponse(with_id(gradingCriteria))
\ No newline at end of file
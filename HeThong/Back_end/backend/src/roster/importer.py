@@ -0,0 +1,170 @@
+"""
+Nhập danh sách học sinh / giáo viên từ file CSV hoặc XLSX (dùng cho đầu năm học, hàng nghìn tài khoản).
+File được đọc theo từng lô: mỗi lô kiểm tra email trùng bằng một truy vấn $in, băm mật khẩu song song
+và ghi bằng insert_many(ordered=False). Kết quả trả về theo từng dòng của file.
+"""
+import asyncio
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+from auth import hash_initial_password
+from identity_store import create_accounts, existing_emails
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl là tùy chọn: thiếu thì chỉ nhận file CSV
+    openpyxl = None
+
+# Số dòng xử lý mỗi lô (một truy vấn $in và một insert_many cho mỗi lô)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "20000"))
+# Số luồng băm mật khẩu khi nhập, tách khỏi luồng bcrypt của đăng nhập
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Dùng chung cho mọi lần nhập (các lần nhập đồng thời chia nhau IMPORT_HASH_WORKERS luồng)
+_hash_executor = ThreadPoolExecutor(max_workers=IMPORT_HASH_WORKERS, thread_name_prefix="roster-bcrypt")
+
+# Tên cột chấp nhận trong file -> tên trường trong collection
+COLUMN_ALIASES = {
+    "name": "name", "họ tên": "name", "họ và tên": "name", "ho_ten": "name",
+    "email": "email",
+    "password": "password", "mật khẩu": "password", "mat_khau": "password",
+    "classinfor": "classinfor", "class": "classinfor", "lớp": "classinfor", "lop": "classinfor",
+    "subject": "subject", "môn": "subject", "môn học": "subject", "mon_hoc": "subject",
+}
+
+
+def _normalize_header(header):
+    return [COLUMN_ALIASES.get(str(h or "").strip().lower()) for h in header]
+
+
+def _csv_rows(file):
+    reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield row
+
+
+def _xlsx_rows(file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def _open_rows(upload: UploadFile):
+    filename = (upload.filename or "").lower()
+    if filename.endswith(".csv"):
+        return _csv_rows(upload.file)
+    if filename.endswith(".xlsx"):
+        if openpyxl is None:
+            raise HTTPException(status_code=400, detail="Máy chủ chưa cài openpyxl, hãy gửi file CSV.")
+        return _xlsx_rows(upload.file)
+    raise HTTPException(status_code=400, detail="Chỉ nhận file .csv hoặc .xlsx")
+
+
+def shutdown_import_executor():
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _validation_message(e: ValidationError):
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+async def _import_batch(role: str, schema, rows, seen: set, report: dict):
+    loop = asyncio.get_running_loop()
+    results = []
+    candidates = []
+    for line, record in rows:
+        result = {"row": line, "email": record.get("email")}
+        results.append(result)
+        try:
+            account = schema(**record)
+        except ValidationError as e:
+            result.update(status="invalid", error=_validation_message(e))
+            continue
+        if account.email in seen:
+            result.update(status="duplicate", error="Email lặp lại trong file")
+            continue
+        seen.add(account.email)
+        candidates.append((result, account))
+
+    taken = await existing_emails(account.email for _, account in candidates) if candidates else set()
+    accounts = []
+    for result, account in candidates:
+        if account.email in taken:
+            result.update(status="exists", error="Email đã tồn tại")
+        else:
+            accounts.append((result, account))
+
+    # bcrypt nhả GIL nên các luồng băm chạy song song trên nhiều CPU
+    hashes = await asyncio.gather(
+        *(loop.run_in_executor(_hash_executor, hash_initial_password, account.password) for _, account in accounts)
+    )
+    users = []
+    for (result, account), hashed in zip(accounts, hashes):
+        user = account.dict(exclude={"id"})
+        user["password"] = hashed
+        user["role"] = role
+        users.append(user)
+
+    errors = await create_accounts(role, users) if users else {}
+    for index, ((result, _), user) in enumerate(zip(accounts, users)):
+        error = errors.get(index)
+        if error is None:
+            result.update(status="created", id=user["_id"])
+        elif error.get("code") == 11000:
+            # Tài khoản được tạo cùng lúc bởi request khác
+            result.update(status="exists", error="Email đã tồn tại")
+        else:
+            result.update(status="failed", error=error.get("errmsg"))
+
+    for result in results:
+        report[result["status"]] = report.get(result["status"], 0) + 1
+    report["rows"].extend(results)
+
+
+async def import_roster(upload: UploadFile, role: str, schema):
+    """
+    Nhập tài khoản từ file danh sách. Dòng đầu là tiêu đề cột (name, email, password, classinfor / subject,
+    hoặc tên tiếng Việt tương ứng). Trả về số lượng theo trạng thái và kết quả từng dòng:
+    created / exists (email đã có) / duplicate (lặp trong file) / invalid (thiếu hoặc sai dữ liệu) / failed.
+    Quá IMPORT_MAX_ROWS dòng thì phần còn lại bị bỏ qua và báo "truncated": true.
+    """
+    rows = _open_rows(upload)
+    header = await asyncio.to_thread(next, rows, None)
+    if not header:
+        raise HTTPException(status_code=400, detail="File không có dữ liệu")
+    fields = _normalize_header(header)
+    if "email" not in fields:
+        raise HTTPException(status_code=400, detail="File phải có cột email")
+
+    report = {"total": 0, "rows": []}
+    seen = set()
+    line = 1
+    while True:
+        # Đọc file theo từng lô trên luồng phụ (file tạm của UploadFile có thể nằm trên đĩa)
+        chunk = await asyncio.to_thread(lambda: list(islice(rows, IMPORT_BATCH_SIZE)))
+        if not chunk:
+            break
+        batch = []
+        for values in chunk:
+            line += 1
+            if not any(str(v).strip() for v in values):
+                continue
+            record = {f: str(v).strip() for f, v in zip(fields, values) if f and str(v).strip()}
+            batch.append((line, record))
+        remaining = IMPORT_MAX_ROWS - report["total"]
+        if len(batch) > remaining:
+            # Chỉ nhập tối đa IMPORT_MAX_ROWS dòng, phần còn lại của file bị bỏ qua
+            batch = batch[:remaining]
+            report["truncated"] = True
+        report["total"] += len(batch)
+        await _import_batch(role, schema, batch, seen, report)
+        if report.get("truncated"):
+            break
+    return report
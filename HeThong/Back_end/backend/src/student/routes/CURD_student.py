@@ -1,34 +1,40 @@
-from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
-from auth import hash_password, get_current_student
+from fastapi import APIRouter, HTTPException, Depends, Response, UploadFile, File
+from auth import hash_password_async, get_current_student, invalidate_principal, load_profile
 from src.student.models.student_schema import Student
 from database.database import students_collection
+from database.pagination import PageParams, paginate
+from responses import MongoJSONResponse, with_id
+from src.roster.importer import import_roster
+from identity_store import create_account, update_identity, delete_identity
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from typing import List
 
 router = APIRouter()
 
 # API: Lấy danh sách sinh viên
-@router.get("/", response_model=List[Student])
-async def get_students():
-    students = list(students_collection.find({}))
-    for student in students:
-        student["id"] = str(student.pop("_id"))  # Chuyển ObjectId thành string
-    return students
+@router.get("/")
+async def get_students(response: Response, page: PageParams = Depends()):
+    students = await paginate(students_collection, {}, page, response)
+    return MongoJSONResponse([with_id(student) for student in students], headers=response.headers)
 
 # API: Thêm sinh viên mới (POST)
 @router.post("/", response_model=Student)
 async def create_student(student: Student):
-    if students_collection.find_one({"email": student.email}):
-        raise HTTPException(status_code=400, detail="Email đã tồn tại")
-
     student_dict = student.dict(exclude={"id"})
-    student_dict["password"] = hash_password(student.password)
+    student_dict["password"] = await hash_password_async(student.password)
     student_dict["role"] = student.role if student.role else "student"  # Đảm bảo có role
 
-    result = students_collection.insert_one(student_dict)
-    student_dict["id"] = str(result.inserted_id)
-    return student_dict
+    try:
+        # Email là duy nhất trên mọi vai trò (học sinh, giáo viên), kiểm tra qua collection định danh
+        await create_account("student", student_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email đã tồn tại")
+    return MongoJSONResponse(with_id(student_dict))
+
+# API: Nhập danh sách sinh viên từ file CSV / XLSX (cột: name, email, password, classinfor)
+@router.post("/import")
+async def import_students(file: UploadFile = File(...)):
+    return MongoJSONResponse(await import_roster(file, "student", Student))
 
 # API: Cập nhật thông tin sinh viên (PUT)
 @router.put("/{student_id}", response_model=Student)
@@ -39,18 +45,24 @@ async def update_student(student_id: str, student: Student):
     student_dict = student.dict(exclude_unset=True, exclude={"id"})
     if "role" not in student_dict:  # Đảm bảo role không bị mất khi cập nhật
         student_dict["role"] = "student"
+    if student_dict.get("password"):
+        student_dict["password"] = await hash_password_async(student_dict["password"])
 
-    result = students_collection.update_one(
+    try:
+        await update_identity("student", student_id, student_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email đã tồn tại")
+
+    result = await students_collection.update_one(
         {"_id": ObjectId(student_id)}, {"$set": student_dict}
     )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy học sinh")
 
-    updated_student = students_collection.find_one({"_id": ObjectId(student_id)})
-    updated_student["id"] = str(updated_student.pop("_id"))
-
-    return updated_student
+    invalidate_principal("student", student_id)
+    updated_student = await students_collection.find_one({"_id": ObjectId(student_id)})
+    return MongoJSONResponse(with_id(updated_student))
 
 
 # API: Xóa sinh viên theo ID
@@ -59,7 +71,9 @@ async def delete_student(student_id: str):
     if not ObjectId.is_valid(student_id):
         raise HTTPException(status_code=400, detail="ID không hợp lệ")
 
-    result = students_collection.delete_one({"_id": ObjectId(student_id)})
+    result = await students_collection.delete_one({"_id": ObjectId(student_id)})
+    await delete_identity("student", student_id)
+    invalidate_principal("student", student_id)
     if result.deleted_count == 1:
         return {"message": f"Học sinh {student_id} đã bị xóa"}
 
@@ -68,13 +82,11 @@ async def delete_student(student_id: str):
 
 @router.get("/me")
 async def get_me_student(current_student: dict = Depends(get_current_student)):
-    print("🔍 Bắt đầu tìm sinh viên trong DB...")
-    student = students_collection.find_one({"_id": ObjectId(current_student["id"])}) # Sửa ở đây
-    print("✅ Truy vấn hoàn tất, kết quả:", student)
+    # Dùng luôn người dùng đã nạp khi xác thực (có cache), không truy vấn MongoDB lần nữa
+    student = await load_profile(current_student)
 
     if student:
-        student["id"] = str(student.pop("_id"))
-        return student
+        return MongoJSONResponse(student)
     else:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên")
 
@@ -84,11 +96,10 @@ async def get_student_by_id(student_id: str):
     if not ObjectId.is_valid(student_id):
         raise HTTPException(status_code=400, detail="ID không hợp lệ")
 
-    student = students_collection.find_one({"_id": ObjectId(student_id)})
+    student = await students_collection.find_one({"_id": ObjectId(student_id)})
 
     if student is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy học sinh")
 
-    student["id"] = str(student.pop("_id"))
-    return student
+    return MongoJSONResponse(with_id(student))
 
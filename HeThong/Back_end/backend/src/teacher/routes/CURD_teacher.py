@@ -1,33 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response, UploadFile, File
 from src.teacher.models.teacher_schema import Teacher
 from database.database import teachers_collection
-from auth import hash_password, get_current_teacher  # Import hàm mã hóa mật khẩu
+from database.pagination import PageParams, paginate
+from responses import MongoJSONResponse, with_id
+from auth import hash_password_async, get_current_teacher, invalidate_principal, load_profile  # Import hàm mã hóa mật khẩu
+from src.roster.importer import import_roster
+from identity_store import create_account, update_identity, delete_identity
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from typing import List
-from database.database import teachers_collection
 router = APIRouter()
 
 # API: Lấy danh sách tất cả giáo viên
-@router.get("/", response_model=List[Teacher])
-async def get_teachers():
-    teachers = list(teachers_collection.find({}))
-    for teacher in teachers:
-        teacher["id"] = str(teacher.pop("_id"))
-    return teachers
+@router.get("/")
+async def get_teachers(response: Response, page: PageParams = Depends()):
+    teachers = await paginate(teachers_collection, {}, page, response)
+    return MongoJSONResponse([with_id(teacher) for teacher in teachers], headers=response.headers)
 
 # API: Tạo giáo viên mới
 @router.post("/", response_model=Teacher)
 async def create_teacher(teacher: Teacher):
-    if teachers_collection.find_one({"email": teacher.email}):  
-        raise HTTPException(status_code=400, detail="Email đã tồn tại")
-
     teacher_dict = teacher.dict(exclude={"id"})
-    teacher_dict["password"] = hash_password(teacher.password)
+    teacher_dict["password"] = await hash_password_async(teacher.password)
     teacher_dict["role"] = teacher.role if teacher.role else "teacher"  # Đảm bảo có role
 
-    result = teachers_collection.insert_one(teacher_dict)
-    teacher_dict["id"] = str(result.inserted_id)
-    return teacher_dict
+    try:
+        # Email là duy nhất trên mọi vai trò (học sinh, giáo viên), kiểm tra qua collection định danh
+        await create_account("teacher", teacher_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email đã tồn tại")
+    return MongoJSONResponse(with_id(teacher_dict))
+
+# API: Nhập danh sách giáo viên từ file CSV / XLSX (cột: name, email, password, subject)
+@router.post("/import")
+async def import_teachers(file: UploadFile = File(...)):
+    return MongoJSONResponse(await import_roster(file, "teacher", Teacher))
 
 # API: Cập nhật thông tin giáo viên (PUT)
 @router.put("/{teacher_id}", response_model=Teacher)
@@ -37,26 +43,27 @@ async def update_teacher(teacher_id: str, teacher: Teacher):
 
     teacher_dict = teacher.dict(exclude_unset=True, exclude={"id"})
 
-    # Kiểm tra tính duy nhất của email (nếu cần)
-    if "email" in teacher_dict:
-        existing_teacher = teachers_collection.find_one({"email": teacher_dict["email"]})
-        if existing_teacher and str(existing_teacher["_id"]) != teacher_id:
-            raise HTTPException(status_code=400, detail="Email đã tồn tại")
-
     if "role" not in teacher_dict:  # Đảm bảo role không bị mất khi cập nhật
         teacher_dict["role"] = "teacher"
+    if teacher_dict.get("password"):
+        teacher_dict["password"] = await hash_password_async(teacher_dict["password"])
+
+    # Kiểm tra tính duy nhất của email: unique index trên collection định danh
+    try:
+        await update_identity("teacher", teacher_id, teacher_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email đã tồn tại")
 
-    result = teachers_collection.update_one(
+    result = await teachers_collection.update_one(
         {"_id": ObjectId(teacher_id)}, {"$set": teacher_dict}
     )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Không tìm thấy giáo viên")
 
-    updated_teacher = teachers_collection.find_one({"_id": ObjectId(teacher_id)})
-    updated_teacher["id"] = str(updated_teacher.pop("_id"))
-
-    return updated_teacher
+    invalidate_principal("teacher", teacher_id)
+    updated_teacher = await teachers_collection.find_one({"_id": ObjectId(teacher_id)})
+    return MongoJSONResponse(with_id(updated_teacher))
 
 # API: Xóa giáo viên theo ID
 @router.delete("/{teacher_id}")
@@ -64,7 +71,9 @@ async def delete_teacher(teacher_id: str):
     if not ObjectId.is_valid(teacher_id):
         raise HTTPException(status_code=400, detail="ID không hợp lệ")
 
-    result = teachers_collection.delete_one({"_id": ObjectId(teacher_id)})
+    result = await teachers_collection.delete_one({"_id": ObjectId(teacher_id)})
+    await delete_identity("teacher", teacher_id)
+    invalidate_principal("teacher", teacher_id)
     if result.deleted_count == 1:
         return {"message": f"Giáo viên {teacher_id} đã bị xóa"}
 
@@ -73,13 +82,11 @@ async def delete_teacher(teacher_id: str):
 # API: Lấy thông tin của giáo viên đã đăng nhập
 @router.get("/me")
 async def get_me_teacher(current_teacher: dict = Depends(get_current_teacher)):
-    print("🔍 Bắt đầu tìm sinh viên trong DB...")
-    teacher = teachers_collection.find_one({"_id": ObjectId(current_teacher["id"])}) # Sửa ở đây
-    print("✅ Truy vấn hoàn tất, kết quả:", teacher)
+    # Dùng luôn người dùng đã nạp khi xác thực (có cache), không truy vấn MongoDB lần nữa
+    teacher = await load_profile(current_teacher)
 
     if teacher:
-        teacher["id"] = str(teacher.pop("_id"))
-        return teacher
+        return MongoJSONResponse(teacher)
     else:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên")
 
@@ -90,10 +97,9 @@ async def get_teacher_by_id(teacher_id: str):
     if not ObjectId.is_valid(teacher_id):
         raise HTTPException(status_code=400, detail="ID không hợp lệ")
 
-    teacher = teachers_collection.find_one({"_id": ObjectId(teacher_id)})
+    teacher = await teachers_collection.find_one({"_id": ObjectId(teacher_id)})
     if not teacher:
         raise HTTPException(status_code=404, detail="Không tìm thấy giáo viên")
 
-    teacher["id"] = str(teacher.pop("_id"))
-    return teacher
+    return MongoJSONResponse(with_id(teacher))
 
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+from metrics import route_label
+
+
+def _client():
+    essays = APIRouter()
+    login = APIRouter()
+    dashboard = APIRouter(prefix="/dashboard")
+
+    @essays.get("/")
+    def list_essays():
+        return []
+
+    @essays.get("/{essay_id}")
+    def get_essay(essay_id: str):
+        return {}
+
+    @essays.get("/{essay_id}/grading-status")
+    def grading_status(essay_id: str):
+        return {}
+
+    @login.post("")
+    def login_user():
+        return {}
+
+    @dashboard.get("/stats/pie")
+    def pie():
+        return []
+
+    app = FastAPI()
+    app.include_router(essays, prefix="/essays")
+    app.include_router(login, prefix="/login")
+    app.include_router(dashboard)
+    labels = []
+
+    # Giống middleware log_requests trong main.py: nhãn được tính sau khi route đã xử lý
+    @app.middleware("http")
+    async def record(request: Request, call_next):
+        response = await call_next(request)
+        labels.append(route_label(request))
+        return response
+
+    @app.get("/")
+    def root():
+        return {}
+
+    return TestClient(app), labels
+
+
+def test_route_label_includes_router_prefix():
+    client, labels = _client()
+    client.get("/essays/bad")
+    client.get("/essays/abc/grading-status")
+    client.get("/essays/")
+    client.get("/")
+    client.post("/login")
+    client.get("/dashboard/stats/pie")
+    assert labels == [
+        "/essays/{essay_id}",
+        "/essays/{essay_id}/grading-status",
+        "/essays/",
+        "/",
+        "/login",
+        "/dashboard/stats/pie",
+    ]
+
+
+def test_route_label_unmatched():
+    client, labels = _client()
+    client.get("/khong-ton-tai")
+    assert labels == ["unmatched"]
@@ -0,0 +1,49 @@
+import asyncio
+import hashlib
+import os
+from fastapi import HTTPException, UploadFile
+
+# Đọc file tải lên theo từng khối, giới hạn dung lượng tối đa (byte)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Header "%PDF-" có thể đứng sau tối đa 1024 byte rác theo đặc tả PDF
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+
+async def ingest_pdf_upload(file: UploadFile, dest_path: str):
+    """
+    Ghi file PDF tải lên vào dest_path theo từng khối, tính SHA-256 trong lúc ghi.
+    Từ chối ngay ở khối đầu tiên nếu không phải PDF, và dừng khi vượt quá MAX_UPLOAD_BYTES.
+    Trả về dict gồm path, content_hash, size.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{dest_path}.part"
+
+    first_chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    if PDF_MAGIC not in first_chunk[:PDF_MAGIC_WINDOW]:
+        raise HTTPException(status_code=400, detail=f"File '{file.filename}' không phải PDF.")
+
+    out = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        chunk = first_chunk
+        while chunk:
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File '{file.filename}' vượt quá dung lượng cho phép ({MAX_UPLOAD_BYTES // (1024 * 1024)} MB)."
+                )
+            digest.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        await asyncio.to_thread(out.close)
+        await asyncio.to_thread(os.replace, tmp_path, dest_path)
+    except BaseException:
+        out.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {"path": dest_path, "content_hash": digest.hexdigest(), "size": size}